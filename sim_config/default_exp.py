@@ -8,12 +8,14 @@ from sim_utils.common_types import QuantizationType, OptimizationType, PolarPosi
 from stages.input.input_generation_stage import InputGenerationStage
 from stages.noise.gaussian_noise import GaussianNoise
 from stages.sampling.ideal_adc_stage import IdealADCStage
-from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger
+from stages.sampling.trigger_window_stage import TriggerWindowStage
+from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger, PingNotDetectedError
 from stages.tdoa_calc.cross_correlation_stage import CrossCorrelationStage
 from stages.localization.multilateration.nls import NLSPositionCalc
 from sim_utils import plt_utils
 from matplotlib.pyplot import show
 from sim_utils.output_utils import initialize_logger
+from sim_utils.input_generation import clear_signal_cache
 
 from experiment import Experiment
 
@@ -22,7 +24,8 @@ class DefaultExp(Experiment):
     frames = None
 
     # Create simulation chain
-    def __init__(self):
+    # with trigger_first set, only the window the capture trigger keeps is noised and sampled
+    def __init__(self, trigger_first=False):
         self.logger = initialize_logger(__name__)
         self.results = []  # Position list
 
@@ -36,6 +39,9 @@ class DefaultExp(Experiment):
         ]
 
         global_vars.pinger_position = CylindricalPosition(10, 0, 10)
+        # drop clean signals cached for the previous configuration
+        clear_signal_cache()
+
         # create initial simulation signal
 
         sim_signal = None
@@ -47,17 +53,29 @@ class DefaultExp(Experiment):
         )
 
         self.sigma = 0.01
+        num_bits = 12
+        num_samples = int(
+            10 * (global_vars.sampling_frequency / global_vars.signal_frequency))  # sample 10 cycles of the wave
+        threshold = 0.05 * (2 ** (num_bits-1))
+        # a fixed ADC range around the unit amplitude signal, so that the trigger window stage
+        # knows the exact analog threshold and both chains quantize alike
+        full_scale = (-1 - 6*self.sigma, 1 + 6*self.sigma)
+
+        if trigger_first:
+            self.simulation_chain.add_component(
+                TriggerWindowStage(num_samples=num_samples, threshold=threshold, num_bits=num_bits,
+                                   noise_sigma=self.sigma, full_scale=full_scale)
+            )
+
         self.simulation_chain.add_component(
             GaussianNoise(mu=0, sigma=self.sigma)
         )
 
         self.simulation_chain.add_component(
-            IdealADCStage(num_bits=12, quantization_method=QuantizationType.midtread)
+            IdealADCStage(num_bits=num_bits, quantization_method=QuantizationType.midtread,
+                          full_scale=full_scale)
         )
 
-        num_samples = int(
-            10 * (global_vars.sampling_frequency / global_vars.signal_frequency))  # sample 10 cycles of the wave
-        threshold = 0.05 * (2 ** 11)
         self.simulation_chain.add_component(
             ThresholdCaptureTrigger(num_samples=num_samples, threshold=threshold)
         )
@@ -75,7 +93,12 @@ class DefaultExp(Experiment):
     def apply(self):
         self.results = []
         for i in range(global_vars.num_iterations):
-            self.results.append(self.simulation_chain.apply())
+            try:
+                self.results.append(self.simulation_chain.apply(iteration=i))
+            except PingNotDetectedError:
+                # a noisy iteration can miss the ping entirely, skip it
+                self.logger.warning("No ping detected on iteration %d, skipping it" % i)
+                continue
             self.frames = self.simulation_chain.frames
 
         return self.results
@@ -12,6 +12,7 @@ from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger
 from stages.localization.subspace.music import MUSIC
 import sim_utils.plt_utils as plt
 from sim_utils.output_utils import initialize_logger
+from sim_utils.input_generation import clear_signal_cache
 
 from experiment import Experiment
 
@@ -90,13 +91,16 @@ class DefaultMusicExp(Experiment):
             theta_string: [],
             phi_string: []
         }
-        for phi in self.param_vals:
+        for phi_index, phi in enumerate(self.param_vals):
             computed_theta = []
             computed_phi = []
             global_vars.pinger_position = CylindricalPosition(10, phi, 5)
+            # the clean signal for the previous pinger position is not needed anymore
+            clear_signal_cache()
             self.logger.info("Running simulation with pinger DOA at %.2f"%(phi*CONV_2_DEG))
             for i in range(global_vars.num_iterations):
-                result = self.simulation_chain.apply()
+                # every (pinger position, iteration) pair gets its own random streams
+                result = self.simulation_chain.apply(iteration=phi_index*global_vars.num_iterations + i)
 
                 self.logger.info("System computed a DOA of (theta, phi) = (%.2f, %.2f)"
                                  %(result[0]*CONV_2_DEG, result[1]*CONV_2_DEG))
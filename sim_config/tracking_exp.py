@@ -0,0 +1,124 @@
+from components.chain import Chain
+
+import numpy as np
+import global_vars
+from sim_utils.common_types import QuantizationType, OptimizationType, PolarPosition, CylindricalPosition, \
+    cart_to_cyl, CartesianPosition
+
+from stages.input.input_generation_stage import InputGenerationStage
+from stages.noise.gaussian_noise import GaussianNoise
+from stages.sampling.ideal_adc_stage import IdealADCStage
+from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger, PingNotDetectedError
+from stages.tdoa_calc.cross_correlation_stage import CrossCorrelationStage
+from stages.localization.multilateration.nls import NLSPositionCalc
+from stages.localization.tracking.kalman_tracker import KalmanTracker
+from sim_utils import plt_utils
+from matplotlib.pyplot import show
+from sim_utils.output_utils import initialize_logger
+
+from experiment import Experiment
+
+class TrackingExp(Experiment):
+    results = None
+    frames = None
+
+    # Create simulation chain
+    # the pinger moves at a constant velocity relative to the array, one ping per iteration
+    def __init__(self, start=CylindricalPosition(15, np.pi/4, 5), velocity=(-0.6, 0.4)):
+        self.logger = initialize_logger(__name__)
+        self.results = []  # tracked positions
+        self.measurements = []  # positions calculated from every ping alone
+        self.trajectory = []  # true pinger positions
+
+        # Modify global constants
+        global_vars.hydrophone_positions = [
+            CylindricalPosition(0, 0, 0),
+            CylindricalPosition(1.85e-2, 0, -1e-2),
+            CylindricalPosition(1.85e-2, np.pi/2, -1e-2),
+            CylindricalPosition(1.85e-2, np.pi, -1e-2),
+            CylindricalPosition(1.85e-2, -np.pi/2, -1e-2),
+        ]
+
+        self.start = start
+        self.velocity = velocity
+        global_vars.pinger_position = start
+        self.initial_guess = PolarPosition(10, np.pi)
+        global_vars.initial_guess = self.initial_guess
+
+        # create initial simulation signal
+
+        sim_signal = None
+
+        self.simulation_chain = Chain(sim_signal)
+
+        # only the samples around the ping are generated
+        self.simulation_chain.add_component(
+            InputGenerationStage(measurement_period=2, duty_cycle=0.05, sparse=True)
+        )
+
+        self.sigma = 0.01
+        self.simulation_chain.add_component(
+            GaussianNoise(mu=0, sigma=self.sigma)
+        )
+
+        num_bits = 12
+        self.simulation_chain.add_component(
+            IdealADCStage(num_bits=num_bits, quantization_method=QuantizationType.midtread)
+        )
+
+        num_samples = int(
+            10 * (global_vars.sampling_frequency / global_vars.signal_frequency))  # sample 10 cycles of the wave
+        threshold = 0.05 * (2 ** (num_bits-1))
+        self.simulation_chain.add_component(
+            ThresholdCaptureTrigger(num_samples=num_samples, threshold=threshold)
+        )
+
+        self.simulation_chain.add_component(
+            CrossCorrelationStage(interpolation="parabolic")
+        )
+
+        # the guess is read on every ping, where the tracker leaves its prediction
+        self.nls = NLSPositionCalc(optimization_type=OptimizationType.newton_gauss, guess_at_init=False)
+        self.simulation_chain.add_component(self.nls)
+
+        self.tracker = KalmanTracker()
+        self.simulation_chain.add_component(self.tracker)
+
+    def pinger_position(self, iteration):
+        time = iteration/global_vars.carrier_frequency
+        start = CartesianPosition(self.start.r*np.cos(self.start.phi), self.start.r*np.sin(self.start.phi), self.start.z)
+
+        return cart_to_cyl(CartesianPosition(start.x + self.velocity[0]*time,
+                                             start.y + self.velocity[1]*time,
+                                             start.z))
+
+    # Execute here
+    def apply(self):
+        self.results = []
+        self.measurements = []
+        self.trajectory = []
+        self.tracker.reset()
+        global_vars.initial_guess = self.initial_guess
+
+        for i in range(global_vars.num_iterations):
+            global_vars.pinger_position = self.pinger_position(i)
+            # the tracker predicts over the pings skipped since its last update
+            self.tracker.set_ping_time(i/global_vars.carrier_frequency)
+            try:
+                self.results.append(self.simulation_chain.apply(iteration=i))
+            except PingNotDetectedError:
+                # a noisy iteration can miss the ping entirely, skip it
+                self.logger.warning("No ping detected on iteration %d, skipping it" % i)
+                continue
+            self.trajectory.append(global_vars.pinger_position)
+            self.measurements.append(self.tracker.write_frame(None)["measurement"])
+            self.frames = self.simulation_chain.frames
+
+        return self.results
+
+    def display_results(self):
+        if self.results:
+            plt_utils.plot_track(self.trajectory, self.measurements, self.results)
+            show()
+        else:
+            self.logger.warn("Run the experiment before displaying results.")
@@ -1,22 +1,82 @@
 import importlib
+import numpy as np
+from sim_utils.common_types import SignalSegment
+from sim_utils import rng
 
 
 class Chain():
+    '''
+    Runs the simulation signal through every component in order.
 
-    def __init__(self, chain_start_data):
+    If block_size is set, the chain runs in streaming mode: the leading components
+    that implement stream(blocks, block_size) pass fixed-size SignalSegment blocks
+    to each other through generators instead of whole-measurement arrays. The
+    output of the last streaming component is joined and handed to the rest of the
+    chain as usual.
+
+    Every apply call is an iteration. Components that have a set_rng(generator)
+    method get a random stream for that iteration from sim_utils.rng, so the
+    output of iteration k is reproducible on its own.
+
+    Components with an owns_output attribute set to True return arrays that
+    nothing else refers to. The chain tells the next component through its
+    set_input_owned method, if it has one, so that it can work in place.
+
+    Components with a set_input_sampling_frequency method are told, when they are
+    added, the output_sampling_frequency of the closest component before them that
+    has one, so sampling and noise stages always agree with the rate of their input.
+    '''
+
+    def __init__(self, chain_start_data, block_size=None):
         self.chain = []
         self.chain_start_data = chain_start_data
+        self.block_size = block_size
         self.frames = []
+        # iteration used when apply is not given one
+        self.next_iteration = 0
 
     def add_component(self, component):
+        if hasattr(component, "set_input_sampling_frequency"):
+            for previous in reversed(self.chain):
+                sampling_frequency = getattr(previous, "output_sampling_frequency", None)
+                if sampling_frequency is not None:
+                    component.set_input_sampling_frequency(sampling_frequency)
+                    break
+
         self.chain.append(component)
 
     def __repr__(self):
         print([ele.__repr__() for ele in self.chain])
 
-    def apply(self):
+    def apply(self, iteration=None):
+        if iteration is None:
+            iteration = self.next_iteration
+        self.next_iteration = iteration + 1
+        rng.seed_iteration(self.chain, iteration)
+
         prev_signal = self.chain_start_data
-        for component_instance in self.chain:
+        components = self.chain
+        first_index = 0
+
+        if self.block_size is not None:
+            num_streamed = 0
+            while num_streamed < len(self.chain) and hasattr(self.chain[num_streamed], "stream"):
+                num_streamed += 1
+
+            blocks = prev_signal
+            for index, component_instance in enumerate(self.chain[:num_streamed]):
+                self.hand_over(index)
+                blocks = component_instance.stream(blocks, self.block_size)
+                frame = component_instance.write_frame(None)
+
+                self.frames.append(frame)
+
+            prev_signal = join_blocks(blocks)
+            components = self.chain[num_streamed:]
+            first_index = num_streamed
+
+        for index, component_instance in enumerate(components, start=first_index):
+            self.hand_over(index)
 
             curr_signal = prev_signal
 
@@ -30,3 +90,32 @@ class Chain():
 
         # Do something with result
         return prev_signal
+
+    def hand_over(self, index):
+        # tells a component whether it owns the output of the component before it
+        component_instance = self.chain[index]
+        if hasattr(component_instance, "set_input_owned"):
+            input_owned = index > 0 and getattr(self.chain[index - 1], "owns_output", False)
+            component_instance.set_input_owned(input_owned)
+
+
+def join_blocks(blocks):
+    '''
+    Collects a stream of blocks into a single signal. Streams of SignalSegment
+    blocks are joined into one SignalSegment.
+    '''
+    blocks = list(blocks)
+
+    if not blocks:
+        return None
+    if len(blocks) == 1:
+        return blocks[0]
+
+    if isinstance(blocks[0], SignalSegment):
+        return SignalSegment(
+            np.concatenate([block.data for block in blocks], axis=-1),
+            blocks[0].start_index,
+            blocks[0].num_samples
+        )
+
+    return np.concatenate(blocks, axis=-1)
@@ -11,62 +11,147 @@ import global_vars
 
 
 class IdealADC:
+    '''
+    Samples and quantizes signals. Works on a single channel or on a
+    (n_channels, n_samples) array, in which case every channel is
+    quantized over its own range (unless a full scale range is given).
+    '''
 
-    def __init__(self, num_bits, quantization_method):
+    def __init__(self, num_bits, quantization_method, input_sampling_frequency=None, full_scale=None):
         self.num_bits = num_bits
         self.quantization_method = quantization_method
+        # None means the input is sampled at global_vars.continuous_sampling_frequency
+        self.input_sampling_frequency = input_sampling_frequency
+        # (min, max) analog input range. None scales each signal to its own min and max
+        self.full_scale = full_scale
 
-    def apply(self, sim_signal):
-        # downsamples signal from global_vars.continuous_sampling_frequency to global_vars.sampling_frequency
-        sampled_signal = downsample(sim_signal, global_vars.continuous_sampling_frequency, global_vars.sampling_frequency)
+    def apply(self, sim_signal, out=None):
+        # downsamples signal from the input sampling frequency to global_vars.sampling_frequency
+        sampled_signal = downsample(sim_signal, self.get_input_sampling_frequency(), global_vars.sampling_frequency)
+
+        return self.digitize(sampled_signal, out)
+
+    def digitize(self, sampled_signal, out=None):
         # map signal from continuous values to an unsigned integers of size self.num_bits
         # uses either midrise or midtread quantization as specified by self.quantization_method
-        quantized_signal = quantize(sampled_signal, self.num_bits, self.quantization_method)
+        # and turns the result into a signed integer representation
+        return quantize(sampled_signal, self.num_bits, self.quantization_method,
+                        self.full_scale, offset=2**(self.num_bits-1), out=out)
 
-        # turn into signed integer representation
-        quantized_signal -= 2**(self.num_bits-1)
-        
-        return quantized_signal
+    def get_input_sampling_frequency(self):
+        if self.input_sampling_frequency is None:
+            return global_vars.continuous_sampling_frequency
+        return self.input_sampling_frequency
 
     def write_frame(self, frame):
         pass
 
 
-def downsample(signal, fs_old, fs_new):
-    # adjust new signal length based on sampling rate reduction
-    index_sample_rate = fs_new / fs_old
-    new_length = int(round(index_sample_rate*len(signal)))
+def quantized_dtype(num_bits):
+    '''
+    The smallest signed integer type that can hold the output of a num_bits ADC.
+    The signed output ranges from -2^(num_bits-1) to 2^(num_bits-1) inclusive
+    '''
+    for dtype in (np.int8, np.int16, np.int32):
+        if np.iinfo(dtype).max >= 2**(num_bits-1):
+            return dtype
+    return np.int64
+
+
+def downsample(signal, fs_old, fs_new, out=None):
+    '''
+    Decimates the last axis of signal from fs_old to fs_new by keeping the sample
+    closest to each new sampling instant.
+
+    @param out  optional array to write the downsampled signal into
+    '''
+    signal = np.asarray(signal)
+
+    # nothing to do if the signal is already at the new rate
+    if fs_old == fs_new:
+        if out is None:
+            return signal
+        out[...] = signal
+        return out
 
     # selectively keep indices at correct interval
-    sampled_signal = [
-        signal[int(round(i/index_sample_rate))]
-        for i in range(new_length)
-    ]
+    num_samples = signal.shape[-1]
+    _, indices = decimation_indices(0, num_samples, fs_old, fs_new, num_samples)
+
+    return np.take(signal, indices, axis=-1, out=out)
+
+
+def decimation_indices(start_index, stop_index, fs_old, fs_new, num_samples):
+    '''
+    Finds the samples that downsample would keep from the range [start_index, stop_index)
+    of a signal that is num_samples long.
+
+    @return     A tuple (new_start_index, old_indices). new_start_index is the index of the
+                first kept sample in the downsampled signal and old_indices is a numpy array
+                with the indices of the kept samples in the original signal
+    '''
+    index_sample_rate = fs_new / fs_old
+    new_length = int(round(index_sample_rate*num_samples))
+
+    # candidate new indices, padded by one on each side to absorb rounding
+    first = max(int(np.floor(start_index*index_sample_rate)) - 1, 0)
+    last = min(int(np.ceil(stop_index*index_sample_rate)) + 1, new_length)
+    new_indices = np.arange(first, last)
+    old_indices = np.round(new_indices/index_sample_rate).astype(int)
 
-    return np.array(sampled_signal)
+    in_range = (old_indices >= start_index) & (old_indices < stop_index)
+    new_indices = new_indices[in_range]
 
+    return (new_indices[0] if len(new_indices) else first), old_indices[in_range]
+
+
+def quantize(signal, num_bits, quantization_method, full_scale=None, offset=0, out=None):
+    '''
+    Quantizes the last axis of signal to integers between 0 and 2^num_bits.
+
+    @param full_scale   (min, max) input range. If None, each channel is scaled to its own
+                        min and max
+    @param offset       subtracted from the quantized values, 2^(num_bits-1) gives a signed output
+    @param out          optional integer array to write the result into. By default the
+                        smallest integer type that fits the output is used
+    '''
+    signal = np.asarray(signal)
+
+    if quantization_method not in (QuantizationType.midrise, QuantizationType.midtread):
+        raise ValueError(f"Illegal Quantization Type: {str(type(quantization_method))}")
 
-def quantize(signal, num_bits, quantization_method):
     # number of quantization levels
     L = 2**num_bits
 
-    # shift signal to start at 0
-    sig = signal - min(signal)
-    
-    # find quantization delta
-    delta = max(sig) / L
-
-    if quantization_method == QuantizationType.midrise:
-        quantized_signal = [
-            int(value/delta)
-            for value in sig 
-        ]
-    elif quantization_method == QuantizationType.midtread:
-        quantized_signal = [
-            int(value/delta + 0.5)
-            for value in sig
-        ]
+    if full_scale is None:
+        # shift signal to start at 0
+        low = signal.min(axis=-1, keepdims=True)
+
+        # find quantization delta
+        delta = (signal.max(axis=-1, keepdims=True) - low) / L
     else:
-        raise ValueError(f"Illegal Quantization Type: {str(type(quantization_method))}")
+        # fixed input range, independent of the signal itself
+        low = full_scale[0]
+        delta = (full_scale[1] - full_scale[0]) / L
+
+    # quantization levels are computed in floating point, even for integer input
+    levels = np.subtract(signal, low, dtype=np.result_type(signal, 1.0))
+    levels /= delta
+
+    if quantization_method == QuantizationType.midtread:
+        levels += 0.5
+
+    # truncate towards zero like int()
+    np.trunc(levels, out=levels)
+
+    if full_scale is not None:
+        # saturate values outside of the input range
+        np.clip(levels, 0, L-1, out=levels)
+
+    levels -= offset
+
+    if out is None:
+        out = np.empty(levels.shape, dtype=quantized_dtype(num_bits))
+    np.copyto(out, levels, casting='unsafe')
 
-    return np.array(quantized_signal)
+    return out
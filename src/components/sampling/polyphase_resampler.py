@@ -0,0 +1,166 @@
+'''@package polyphase_resampler
+Anti-aliased rational resampling of multi-channel signals
+
+'''
+
+import numpy as np
+from fractions import Fraction
+from functools import lru_cache
+from scipy import signal
+import global_vars
+from sim_utils.common_types import SignalSegment
+
+# largest denominator considered when turning a sampling rate ratio into up/down factors
+MAX_RATE_DENOMINATOR = 1000
+
+
+class PolyphaseResampler:
+    '''
+    Resamples (n_channels, n_samples) signals from fs_old to fs_new with a polyphase
+    FIR filter. The signal is (conceptually) upsampled by up, low-pass filtered below
+    the lower of the two Nyquist rates and downsampled by down, but only the filter
+    taps that line up with real input samples are ever evaluated.
+
+    Output sample n is aligned with input time n/fs_new, the same alignment as
+    the nearest-index downsample in ideal_adc. The filter taps are cached per
+    (up, down) pair, so creating resamplers is cheap.
+    '''
+
+    def __init__(self, fs_old, fs_new, half_width=10):
+        '''
+        @param fs_old       sampling frequency of the input signal
+        @param fs_new       sampling frequency of the output signal
+        @param half_width   half length of the filter in units of the slower of the
+                            up/down factors. Longer filters have a sharper cutoff
+        '''
+        ratio = Fraction(fs_new / fs_old).limit_denominator(MAX_RATE_DENOMINATOR)
+        self.up = ratio.numerator
+        self.down = ratio.denominator
+        self.half_len, self.taps = polyphase_filter(self.up, self.down, half_width)
+        # number of input samples that contribute to a single output sample
+        self.num_taps = -(-len(self.taps) // self.up)
+
+    def output_length(self, num_samples):
+        # length of the resampled version of a num_samples long signal
+        return int(round(num_samples * self.up / self.down))
+
+    def last_input_index(self, output_index):
+        # index of the latest input sample that contributes to an output sample
+        return (output_index*self.down + self.half_len) // self.up
+
+    def first_output_index(self, input_index):
+        # index of the first output sample that input_index (or any later sample) contributes to
+        return max(-((self.half_len - input_index*self.up) // self.down), 0)
+
+    def apply(self, sim_signal):
+        '''
+        resamples the last axis of a signal that starts at the first sample
+        '''
+        sim_signal = np.asarray(sim_signal)
+        return self.resample(sim_signal, 0, 0, self.output_length(sim_signal.shape[-1]))
+
+    def resample(self, sim_signal, start_index, first_output, num_outputs):
+        '''
+        computes num_outputs output samples starting at output index first_output
+
+        @param sim_signal     (n_channels, n_samples) input samples. Input samples outside
+                              of this array are treated as zero
+        @param start_index    index of the first sample of sim_signal in the full input signal
+        @param first_output   index of the first output sample to compute
+        @param num_outputs    number of output samples to compute
+        '''
+        # delay the filter so that the first kept upfirdn output lines up with output sample 0
+        delay = (start_index*self.up - self.half_len) % self.down
+        taps = np.concatenate((np.zeros(delay), self.taps))
+        filtered = signal.upfirdn(taps, sim_signal, self.up, self.down, axis=-1)
+
+        first = (first_output*self.down + self.half_len + delay - start_index*self.up) // self.down
+
+        output = np.zeros(sim_signal.shape[:-1] + (num_outputs,),
+                          dtype=np.result_type(sim_signal, global_vars.analog_dtype))
+        # outputs outside of the upfirdn output only see zeros
+        lo = min(max(-first, 0), num_outputs)
+        hi = max(min(filtered.shape[-1] - first, num_outputs), lo)
+        output[..., lo:hi] = filtered[..., first + lo:first + hi]
+
+        return output
+
+    def stream(self, blocks):
+        '''
+        resamples a stream of consecutive SignalSegment blocks. The last few input
+        samples of each block are carried over as the filter state, so the output is
+        the same as resampling the joined blocks in one call.
+
+        Output samples past the end of the last block are computed with zero input,
+        up to the end of the resampled signal.
+
+        @return     generator of SignalSegment blocks indexed at the output rate
+        '''
+        history = None
+        history_start = 0
+        next_output = 0
+        total_outputs = 0
+
+        for block in blocks:
+            if history is None:
+                history_start = block.start_index
+                next_output = self.first_output_index(block.start_index)
+                total_outputs = self.output_length(block.num_samples)
+                data = block.data
+            else:
+                data = np.concatenate((history, block.data), axis=-1)
+
+            # every output whose inputs have all arrived
+            last_input = history_start + data.shape[-1] - 1
+            stop_output = min(((last_input + 1)*self.up - 1 - self.half_len) // self.down + 1,
+                              total_outputs)
+
+            if stop_output > next_output:
+                yield SignalSegment(
+                    self.resample(data, history_start, next_output, stop_output - next_output),
+                    next_output,
+                    total_outputs
+                )
+                next_output = stop_output
+
+            # keep only the samples the next output still needs
+            keep_from = self.last_input_index(next_output) - self.num_taps + 1 - history_start
+            keep_from = min(max(keep_from, 0), data.shape[-1])
+            history = data[..., keep_from:]
+            history_start += keep_from
+
+        if history is None:
+            return
+
+        # outputs that still overlap the end of the last block
+        stop_output = min(self.first_output_index(history_start + history.shape[-1] + self.num_taps),
+                          total_outputs)
+        if stop_output > next_output:
+            yield SignalSegment(
+                self.resample(history, history_start, next_output, stop_output - next_output),
+                next_output,
+                total_outputs
+            )
+
+
+@lru_cache(maxsize=None)
+def polyphase_filter(up, down, half_width):
+    '''
+    Designs the anti-aliasing filter for an up/down rational resampler.
+
+    @return     A tuple (half_len, taps) with the read-only filter taps at the upsampled
+                rate and the filter delay half_len in upsampled samples
+    '''
+    max_rate = max(up, down)
+    if max_rate == 1:
+        # same rate on both sides, nothing to filter
+        taps = np.ones(1)
+        taps.setflags(write=False)
+        return 0, taps
+
+    half_len = half_width * max_rate
+    # cutoff at the lower of the two Nyquist frequencies, Kaiser windowed
+    taps = signal.firwin(2*half_len + 1, 1.0/max_rate, window=('kaiser', 5.0)) * up
+
+    taps.setflags(write=False)
+    return half_len, taps
@@ -1,18 +1,45 @@
 import global_vars
+import numpy as np
 
 class ThresholdIndexFinder:
     '''
     Finds the index at which the signal first crosses a certain threshold
+
+    Works on a single channel or on a (n_channels, n_samples) array, in which
+    case the index is the first sample at which any channel crosses. The
+    threshold can be a single value or one value per channel.
     '''
 
-    def __init__(self, num_samples, threshold):
+    def __init__(self, num_samples, threshold, chunk_size=None):
         self.num_samples = num_samples
         self.threshold = threshold
+        # if set, the signal is scanned chunk_size samples at a time and the scan
+        # stops at the first chunk that crosses the threshold
+        self.chunk_size = chunk_size
 
     def apply(self, sim_signal):
-        for i in range(len(sim_signal)):
-            if sim_signal[i] > self.threshold:
-                return i
+        '''
+        @return     index of the first sample above the threshold, or None if the
+                    signal never crosses it
+        '''
+        sim_signal = np.asarray(sim_signal)
+        # one threshold per channel broadcasts along the sample axis
+        threshold = np.asarray(self.threshold)[..., np.newaxis]
+
+        num_samples = sim_signal.shape[-1]
+        chunk_size = num_samples if self.chunk_size is None else self.chunk_size
+
+        for start in range(0, num_samples, max(chunk_size, 1)):
+            above = sim_signal[..., start:start + chunk_size] > threshold
+            if above.ndim > 1:
+                above = above.any(axis=tuple(range(above.ndim - 1)))
+
+            # argmax gives the first True, but is also 0 when there is none
+            index = np.argmax(above)
+            if above[index]:
+                return start + int(index)
+
+        return None
 
     def write_frame(self, frame):
         return frame
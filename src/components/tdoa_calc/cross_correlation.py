@@ -1,5 +1,6 @@
 import matplotlib.pyplot as plt
 from scipy.signal import correlate
+from scipy import fft
 import numpy as np
 import global_vars
 import logging
@@ -8,41 +9,159 @@ from sim_utils.output_utils import initialize_logger
 # create logger object for this module
 logger = initialize_logger(__name__)
 
+# the lags are computed with dot products while those take less than about this
+# many times n*log2(n) operations, n being the FFT size
+FFT_COST_FACTOR = 4
+
+# methods to place a correlation peak between samples. Both fit a curve through the
+# peak and its two neighbours: a parabola, or a parabola through their logarithms
+PEAK_INTERPOLATIONS = (None, "parabolic", "gaussian")
+
 class CrossCorrelation:
-    def __init__(self, identifier):
+    '''
+    Finds the time difference of arrival between two signals from the peak of
+    their cross correlation. Only the lags in the region of interest are computed:
+    by default the lags within half a signal period of zero, or every lag up to
+    max_lag samples if it is set (see CrossCorrelationStage for a bound based on
+    the hydrophone baseline).
+
+    The time difference is a whole number of samples, unless interpolation is set
+    to one of PEAK_INTERPOLATIONS to refine the peak position between samples.
+    '''
+    def __init__(self, identifier, max_lag=None, interpolation=None):
         self.identifier = identifier
+        # largest lag, in samples, that the time difference can have
+        self.max_lag = max_lag
+        check_interpolation(interpolation)
+        self.interpolation = interpolation
 
     def apply(self, sim_signal):
         # compute cross correlation
         h0_sig, h_sig = sim_signal
-        cross_correlation = correlate(h0_sig, h_sig, mode='same')
-        
-        # find discrete signal frequency
-        f = global_vars.signal_frequency / global_vars.sampling_frequency
-        # find number of samples per signal period
-        N = int(np.ceil(1/f))
-        # constrain region of interest based on signal periodicity
-        # note that the correlation distribution is centered at n=0
-        center_idx = int(len(cross_correlation)/2)
-        halfrange = int(N/2)
-        roi = cross_correlation[center_idx-halfrange:center_idx+halfrange]
+        # quantized integer signals would overflow in the correlation sum
+        h0_sig = np.asarray(h0_sig, dtype=global_vars.analog_dtype)
+        h_sig = np.asarray(h_sig, dtype=global_vars.analog_dtype)
+
+        # one extra lag on either side to interpolate a peak at the edge of the roi
+        lags = with_neighbours(self.get_lags())
+        roi = correlate_lags(h0_sig, h_sig, lags)
 
         # plot cross correlation result if log level in debug mode
         level = logger.getEffectiveLevel()
         if level <= logging.DEBUG:
-            self.plot_cross_correlation(cross_correlation, center_idx, halfrange, roi)
+            cross_correlation = correlate(h0_sig, h_sig, mode='same')
+            self.plot_cross_correlation(cross_correlation, lags[1:-1], roi[1:-1])
 
-        maxima_idx = np.argmax(roi) - halfrange
+        maxima_idx = peak_lag(lags, roi, self.interpolation)
 
         return maxima_idx / global_vars.sampling_frequency
 
+    def get_lags(self):
+        return roi_lags(self.max_lag)
+
     def write_frame(self, frame):
         return {}
 
-    def plot_cross_correlation(self, cross_correlation, center_idx, halfrange, roi):
+    def plot_cross_correlation(self, cross_correlation, lags, roi):
         N = len(cross_correlation)
-        n = np.linspace(-N/2, N/2, N)
+        # mode='same' output is centered at lag 0
+        n = np.arange(N) - N//2
         plt.figure()
         plt.plot(n, cross_correlation)
-        plt.plot(n[center_idx-halfrange:center_idx+halfrange] ,roi)
-        plt.title(self.identifier)
\ No newline at end of file
+        plt.plot(lags, roi)
+        plt.title(self.identifier)
+
+
+def roi_lags(max_lag=None):
+    '''
+    The lags, in samples, searched for the correlation peak. Every lag up to max_lag,
+    or the lags within half a signal period of zero if max_lag is None
+    '''
+    if max_lag is not None:
+        return np.arange(-max_lag, max_lag + 1)
+
+    # find discrete signal frequency
+    f = global_vars.signal_frequency / global_vars.sampling_frequency
+    # find number of samples per signal period
+    N = int(np.ceil(1/f))
+    # constrain region of interest based on signal periodicity
+    halfrange = int(N/2)
+    return np.arange(-halfrange, halfrange)
+
+
+def with_neighbours(lags):
+    # extends a range of consecutive lags by one lag on either side
+    return np.arange(lags[0] - 1, lags[-1] + 2)
+
+
+def check_interpolation(interpolation):
+    if interpolation not in PEAK_INTERPOLATIONS:
+        raise ValueError("Peak interpolation must be one of " + str(PEAK_INTERPOLATIONS) +
+                         ". You inputted " + str(interpolation))
+
+
+def peak_lag(lags, correlation, interpolation=None, allowed=None):
+    '''
+    Finds the lag of the correlation peak, excluding the first and last lag, which
+    are only used as neighbours for the interpolation.
+
+    @param lags             consecutive lags at which the correlation was computed
+    @param correlation      (..., n_lags) correlation values. Every row is searched separately
+    @param interpolation    one of PEAK_INTERPOLATIONS. None returns the whole lag of the
+                            largest value
+    @param allowed          optional boolean array, shaped like correlation, of the lags
+                            the peak may be at
+    @return                 the peak lag of every row, in (fractional) samples
+    '''
+    inner = correlation[..., 1:-1]
+    if allowed is not None:
+        inner = np.where(allowed[..., 1:-1], inner, -np.inf)
+    index = np.argmax(inner, axis=-1) + 1
+    peak = lags[index]
+
+    if interpolation is None:
+        return peak
+
+    index = np.expand_dims(index, -1)
+    left, centre, right = (np.take_along_axis(correlation, index + offset, axis=-1)[..., 0]
+                           for offset in (-1, 0, 1))
+
+    if interpolation == "gaussian":
+        # the gaussian fit needs positive values, fall back to a parabola otherwise
+        positive = (left > 0) & (centre > 0) & (right > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            left, centre, right = (np.where(positive, np.log(value), value)
+                                   for value in (left, centre, right))
+
+    curvature = left - 2*centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(curvature < 0, 0.5 * (left - right) / curvature, 0)
+
+    # the vertex of a fit through a maximum is within half a sample of it
+    return peak + np.clip(offset, -0.5, 0.5)
+
+
+def correlate_lags(x, y, lags):
+    '''
+    Computes the cross correlation sum(x[n] * y[n - m]) only at the lags m in lags.
+    The values match scipy.signal.correlate(x, y) at the same lags.
+
+    Uses one dot product per lag, unless an FFT of the whole signals is cheaper.
+    '''
+    lags = np.asarray(lags)
+    fft_size = fft.next_fast_len(len(x) + len(y) - 1, real=True)
+
+    if len(lags) * len(x) > FFT_COST_FACTOR * fft_size * np.log2(fft_size):
+        cross_spectrum = fft.rfft(x, fft_size) * np.conj(fft.rfft(y, fft_size))
+        # negative lags wrap around to the end of the circular correlation
+        return fft.irfft(cross_spectrum, fft_size)[lags % fft_size]
+
+    # y padded with zeros so that every lag lines up a full window with x
+    padding = int(np.abs(lags).max())
+    y_padded = np.zeros(len(x) + 2*padding, dtype=np.result_type(x, y))
+    overlap = min(len(y), len(x) + padding)
+    y_padded[padding:padding + overlap] = y[:overlap]
+
+    # window padding - m of y_padded holds y[n - m] for every n
+    windows = np.lib.stride_tricks.sliding_window_view(y_padded, len(x))
+    return windows[padding - lags] @ x
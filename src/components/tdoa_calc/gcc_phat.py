@@ -0,0 +1,75 @@
+from scipy import fft
+import numpy as np
+import global_vars
+from components.tdoa_calc.cross_correlation import roi_lags, with_neighbours, peak_lag, check_interpolation
+
+
+class GCCPhat:
+    '''
+    Generalized cross correlation of many channel pairs of a multi-channel signal.
+
+    Every channel is transformed once with a real FFT, the cross spectra of all
+    pairs are formed in one operation and inverse transformed as a batch. With
+    phat set, each cross spectrum is whitened (PHAT weighting) so that only its
+    phase is kept, which sharpens the correlation peak of broadband signals. For
+    a narrowband ping it mostly amplifies the noise outside of the signal band.
+
+    For a pair (i, j) the time difference is the lag of the correlation peak
+    between channel i and channel j, the same as CrossCorrelation on
+    (sim_signal[i], sim_signal[j]), including the optional sub-sample peak
+    interpolation.
+    '''
+
+    def __init__(self, pairs, phat=False, max_lags=None, interpolation=None):
+        '''
+        @param pairs        sequence of (i, j) channel index pairs
+        @param phat         whether to apply the PHAT weighting
+        @param max_lags     largest lag, in samples, of every pair. None searches within
+                            half a signal period of zero for all pairs
+        @param interpolation    sub-sample peak interpolation, one of PEAK_INTERPOLATIONS
+                                in cross_correlation
+        '''
+        self.pairs = np.asarray(pairs).reshape(-1, 2)
+        self.phat = phat
+        self.max_lags = None if max_lags is None else np.asarray(max_lags)
+        check_interpolation(interpolation)
+        self.interpolation = interpolation
+
+    def apply(self, sim_signal):
+        '''
+        @return     numpy array with the time difference of every pair, in seconds
+        '''
+        # quantized integer signals would overflow in the correlation sum
+        sim_signal = np.asarray(sim_signal, dtype=global_vars.analog_dtype)
+        lags, correlation = self.correlate(sim_signal)
+
+        allowed = None
+        if self.max_lags is not None:
+            allowed = np.abs(lags) <= self.max_lags[:, np.newaxis]
+
+        return peak_lag(lags, correlation, self.interpolation, allowed) / global_vars.sampling_frequency
+
+    def correlate(self, sim_signal):
+        '''
+        @return     A tuple (lags, correlation). correlation is a (n_pairs, n_lags) array
+                    with the correlation of every pair at each of the lags. The lags
+                    extend one past the searched range on either side
+        '''
+        # long enough for the correlation not to wrap around
+        fft_size = fft.next_fast_len(2*sim_signal.shape[-1] - 1, real=True)
+        spectra = fft.rfft(sim_signal, fft_size, axis=-1)
+
+        cross_spectra = spectra[self.pairs[:, 0]] * np.conj(spectra[self.pairs[:, 1]])
+        if self.phat:
+            magnitude = np.abs(cross_spectra)
+            cross_spectra = np.divide(cross_spectra, magnitude, out=np.zeros_like(cross_spectra),
+                                      where=magnitude > 0)
+
+        lags = with_neighbours(roi_lags(None if self.max_lags is None else int(self.max_lags.max())))
+        # negative lags wrap around to the end of the circular correlation
+        correlation = fft.irfft(cross_spectra, fft_size, axis=-1)[:, lags % fft_size]
+
+        return lags, correlation
+
+    def write_frame(self, frame):
+        return {}
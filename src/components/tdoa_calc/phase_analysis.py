@@ -1,14 +1,15 @@
 import numpy as np
 import global_vars
+from functools import lru_cache
 
 class PhaseAnalysis:
-    
+
     def __init__(self, identifier):
         self.identifier = identifier
 
     def apply(self, sim_signal):
-        hydrophone0_phase = get_phase(sim_signal[0])
-        hydrophone_phase = get_phase(sim_signal[1])
+        # both phases come out of a single product
+        hydrophone0_phase, hydrophone_phase = get_phases(np.stack(sim_signal))
 
         return (hydrophone0_phase - hydrophone_phase) / (2 * np.pi * global_vars.signal_frequency)
 
@@ -16,22 +17,39 @@ class PhaseAnalysis:
         return {}
 
 
-# I can likely get this without a sampling frequency, but that is a todo:
 def get_phase(input_signal):
-    fft = np.fft.fft(input_signal)
-
-    # fft generates a lot of values that are not 0 due to floating point error
-    # eg 3.15e-15 + 3.15e-15j. However these values create notable phase angles
-    # These should just be set to 0
-    threshold = max(np.abs(fft)) / 10000
-    indices_below_thresh = abs(fft) < threshold
-    fft[indices_below_thresh] = 0
-    
-    # this fixes scaling, I'm not 100% sure why this is needed
-    fft = 2 * fft / global_vars.sampling_frequency
+    return get_phases(input_signal)
+
+
+def get_phases(sim_signal):
+    '''
+    Finds the phase of the signal frequency on the last axis of sim_signal, for
+    every channel at once. Only the DFT bin at the signal frequency is computed,
+    as the dot product of each channel with a complex exponential, so the cost is
+    linear in the number of samples.
+
+    @return     the phase of every channel, in radians
+    '''
+    sim_signal = np.asarray(sim_signal, dtype=global_vars.analog_dtype)
+    num_samples = sim_signal.shape[-1]
 
     # find index that matches to signal frequency in the fft spectrum
     sig_discrete_frequency = global_vars.signal_frequency / global_vars.sampling_frequency # fft spectrum ranges from discrete:[0, 1] -> continuous[0, Fs]
-    fft_index =  int(round(sig_discrete_frequency*len(fft), 0))
+    fft_index = int(round(sig_discrete_frequency*num_samples, 0))
+
+    signal_bin = sim_signal @ dft_bin_exponential(num_samples, fft_index, sim_signal.dtype)
+
+    return np.angle(signal_bin)
+
+
+@lru_cache(maxsize=16)
+def dft_bin_exponential(num_samples, fft_index, dtype):
+    '''
+    The complex exponential that picks the fft_index bin of a num_samples point DFT,
+    in the complex type matching a real dtype
+    '''
+    n = np.arange(num_samples)
+    exponential = np.exp(-2j * np.pi * fft_index * n / num_samples).astype(np.result_type(dtype, np.complex64))
 
-    return np.angle(fft[fft_index])
\ No newline at end of file
+    exponential.setflags(write=False)
+    return exponential
@@ -1,5 +1,5 @@
 from sim_utils.common_types import *
-from numpy.random import rand
+from numpy.random import default_rng
 
 ##############################################
 # Procedural Parameters
@@ -7,6 +7,14 @@ from numpy.random import rand
 
 num_iterations = 1
 
+# root seed of every random stream in the simulation (see sim_utils.rng).
+# None draws a fresh seed from the OS on the first use
+seed = None
+
+# floating point type used for the signals in the analog portion of the chain and the
+# digital signal processing stages. Set to np.float32 to halve the memory traffic
+analog_dtype = np.float64
+
 ##############################################
 # Content Parameters
 ##############################################
@@ -40,5 +48,7 @@ attenuation_coeff = 0.02 #TODO: add details in the description here
 
 #### Depth Sensor ####
 depth_sensor_uncertainty = 2e-3 # m
+# reseeded for every iteration by the simulation chain
+depth_sensor_rng = default_rng()
 def depth_sensor_reading():
-    return pinger_position.z + depth_sensor_uncertainty*rand()
\ No newline at end of file
+    return pinger_position.z + depth_sensor_uncertainty*depth_sensor_rng.random()
\ No newline at end of file
@@ -65,6 +65,15 @@ def distance_3Dpoints(location1, location2):
           + (location1.y - location2.y) ** 2
           + (location1.z - location2.z) ** 2) ** (1/2)
 
+##################################################################
+# Signal Constructs
+##################################################################
+
+# A window of a longer multi-channel signal. data holds the (n_channels, n_window_samples)
+# samples starting at index start_index of a signal that is num_samples long in total.
+# Samples outside of the window are treated as zero.
+SignalSegment = namedtuple('SignalSegment', 'data start_index num_samples')
+
 ##################################################################
 # Unit Conversions
 ##################################################################
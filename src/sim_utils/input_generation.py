@@ -4,8 +4,9 @@
 #  Input signals are fed into the component chain and propagated through it
 #  in order to generate the simulation frame output data.
 import numpy as np
-from scipy import signal
+from scipy import signal, special
 from collections import namedtuple
+from functools import lru_cache
 import global_vars
 from sim_utils.common_types import * # TODO: figure out why this feels wrong
 
@@ -116,3 +117,296 @@ class InputGeneration:
         carrier_wave = self._add_leading_zeros(carrier_wave, leading_zeros_t)
 
         return sine_wave * carrier_wave
+
+
+def propagation_delays(hydrophone_positions):
+    """
+    Computes the time taken for the pinger signal to reach each hydrophone
+
+    @param hydrophone_positions   A list of hydrophone positions (CylindricalPosition or CartesianPosition)
+
+    @return   A numpy array of shape (n_hydrophones,) with the propagation time to each hydrophone
+    """
+    return np.array([
+        distance_3Dpoints(position, global_vars.pinger_position)
+        for position in hydrophone_positions
+    ]) / global_vars.speed_of_sound
+
+
+def generate_hydrophone_signals(hydrophone_positions, measurement_period, duty_cycle, at_adc_rate=False):
+    """
+    Generates the signal received by every hydrophone in a single vectorized pass.
+
+    Every channel is written into one preallocated (n_hydrophones, n_samples) array. The
+    per-channel propagation delays are broadcast against a shared time axis, so a channel
+    is zero until the wavefront reaches its hydrophone and is a sine wave gated by the
+    square wave carrier afterwards.
+
+    @param hydrophone_positions   A list of hydrophone positions
+    @param measurement_period     The number of time units to generate the signals for
+    @param duty_cycle             Duty cycle of the square wave carrier
+    @param at_adc_rate            If True, the signals are sampled at global_vars.sampling_frequency
+                                  with band-limited carrier edges instead of being sampled at
+                                  global_vars.continuous_sampling_frequency
+
+    @return   A numpy array of shape (n_hydrophones, measurement_period * sampling frequency)
+              containing the signal received by each hydrophone
+    """
+    fs = _generation_frequency(at_adc_rate)
+    num_samples = int(measurement_period * fs)
+    delays = propagation_delays(hydrophone_positions)
+
+    return _hydrophone_samples(delays, 0, num_samples, duty_cycle, fs, at_adc_rate)
+
+
+def generate_ping_segment(hydrophone_positions, measurement_period, duty_cycle, padding,
+                          at_adc_rate=False):
+    """
+    Generates only the part of the hydrophone signals around the first ping.
+
+    The samples outside of the first ping are zero in every channel, so they are not generated.
+    The returned segment holds exactly the samples generate_hydrophone_signals would produce
+    between its start index and its end.
+
+    @param hydrophone_positions   A list of hydrophone positions
+    @param measurement_period     The number of time units covered by the full measurement
+    @param duty_cycle             Duty cycle of the square wave carrier
+    @param padding                Number of time units kept before the earliest arrival and after
+                                  the end of the latest ping
+    @param at_adc_rate            If True, the segment is sampled at global_vars.sampling_frequency
+                                  (see generate_hydrophone_signals)
+
+    @return   A SignalSegment with (n_hydrophones, n_segment_samples) data
+    """
+    fs = _generation_frequency(at_adc_rate)
+    num_samples = int(measurement_period * fs)
+    delays = propagation_delays(hydrophone_positions)
+    start_index, stop_index = _ping_segment_bounds(delays, num_samples, duty_cycle, padding, fs)
+
+    return SignalSegment(
+        _hydrophone_samples(delays, start_index, stop_index, duty_cycle, fs, at_adc_rate),
+        start_index,
+        num_samples
+    )
+
+
+def stream_hydrophone_signals(hydrophone_positions, measurement_period, duty_cycle, block_size,
+                              sparse=False, padding=0, at_adc_rate=False):
+    """
+    Generates the hydrophone signals lazily, one block of samples at a time.
+
+    Only one block is held in memory at a time, and no samples are generated past the point
+    where the consumer stops iterating.
+
+    @param hydrophone_positions   A list of hydrophone positions
+    @param measurement_period     The number of time units to generate the signals for
+    @param duty_cycle             Duty cycle of the square wave carrier
+    @param block_size             Number of samples per channel in each block
+    @param sparse                 If True, only the blocks around the first ping are generated
+                                  (see generate_ping_segment)
+    @param padding                Padding around the first ping in sparse mode
+    @param at_adc_rate            If True, the signals are sampled at global_vars.sampling_frequency
+
+    @return   A generator of SignalSegment blocks with (n_hydrophones, block_size) data
+    """
+    fs = _generation_frequency(at_adc_rate)
+    num_samples = int(measurement_period * fs)
+    delays = propagation_delays(hydrophone_positions)
+
+    if sparse:
+        start_index, stop_index = _ping_segment_bounds(delays, num_samples, duty_cycle, padding, fs)
+    else:
+        start_index, stop_index = 0, num_samples
+
+    for block_start in range(start_index, stop_index, block_size):
+        block_stop = min(block_start + block_size, stop_index)
+        yield SignalSegment(
+            _hydrophone_samples(delays, block_start, block_stop, duty_cycle, fs, at_adc_rate),
+            block_start,
+            num_samples
+        )
+
+
+# number of clean signal sets kept by cached_hydrophone_signals
+SIGNAL_CACHE_SIZE = 2
+
+def cached_hydrophone_signals(measurement_period, duty_cycle, sparse=False, padding=0,
+                              at_adc_rate=False):
+    """
+    Memoized version of generate_hydrophone_signals (or generate_ping_segment if sparse is set).
+
+    The clean signal only depends on the global hydrophone and pinger geometry, the speed of
+    sound, the frequencies, the analog dtype and the stage parameters, so all of those make up the cache key.
+    Changing any of them in global_vars results in a cache miss rather than a stale signal.
+    The least recently used entries are dropped once SIGNAL_CACHE_SIZE signals are cached.
+
+    The returned arrays are shared between calls and are therefore read-only.
+
+    @return   The same output as the uncached generator
+    """
+    return _cached_signals(
+        tuple(global_vars.hydrophone_positions),
+        global_vars.pinger_position,
+        global_vars.speed_of_sound,
+        global_vars.signal_frequency,
+        global_vars.carrier_frequency,
+        _generation_frequency(at_adc_rate),
+        np.dtype(global_vars.analog_dtype),
+        measurement_period,
+        duty_cycle,
+        sparse,
+        padding,
+        at_adc_rate
+    )
+
+
+def clear_signal_cache():
+    """
+    Drops every signal held by cached_hydrophone_signals
+    """
+    _cached_signals.cache_clear()
+
+
+@lru_cache(maxsize=SIGNAL_CACHE_SIZE)
+def _cached_signals(hydrophone_positions, pinger_position, speed_of_sound, signal_frequency,
+                    carrier_frequency, sampling_frequency, analog_dtype, measurement_period,
+                    duty_cycle, sparse, padding, at_adc_rate):
+    # the global parameters are only passed in to make up the cache key
+    if sparse:
+        segment = generate_ping_segment(hydrophone_positions, measurement_period, duty_cycle,
+                                        padding, at_adc_rate)
+        segment.data.setflags(write=False)
+        return segment
+
+    signals = generate_hydrophone_signals(hydrophone_positions, measurement_period, duty_cycle,
+                                          at_adc_rate)
+    signals.setflags(write=False)
+    return signals
+
+
+# number of samples on either side of a carrier edge that are band-limited
+EDGE_HALF_WIDTH = 16
+# number of samples per channel generated at a time
+GENERATION_CHUNK_SIZE = 2**16
+
+def _generation_frequency(at_adc_rate):
+    if at_adc_rate:
+        return global_vars.sampling_frequency
+    return global_vars.continuous_sampling_frequency
+
+
+def _ping_segment_bounds(delays, num_samples, duty_cycle, padding, fs):
+    # sample range from the earliest arrival to the end of the latest first ping
+    ping_length = duty_cycle / global_vars.carrier_frequency
+
+    start_index = max(int(np.floor((min(delays) - padding) * fs)), 0)
+    stop_index = min(int(np.ceil((max(delays) + ping_length + padding) * fs)), num_samples)
+
+    return start_index, stop_index
+
+
+def _hydrophone_samples(delays, start_index, stop_index, duty_cycle, fs, band_limited=False):
+    """
+    Computes the hydrophone signal samples in the range [start_index, stop_index) of the
+    measurement for every channel at once.
+
+    The sine wave is evaluated at the exact delayed sample times, so sub-sample propagation
+    delays are represented exactly. When band_limited is set, the carrier edges are smoothed
+    with a windowed sinc step so that their sub-sample position is kept as well. This is
+    needed when sampling close to the signal frequency, where a hard edge would be rounded
+    to the nearest sample.
+
+    The samples are computed GENERATION_CHUNK_SIZE columns at a time, straight into the
+    output array, so the double precision time and carrier buffers never grow past a chunk
+    and the peak memory stays close to the size of the output.
+
+    @param delays        numpy array with the propagation delay to each hydrophone
+    @param start_index   Index of the first sample to generate
+    @param stop_index    Index one past the last sample to generate
+    @param duty_cycle    Duty cycle of the square wave carrier
+    @param fs            The frequency at which the signals are sampled
+    @param band_limited  Whether to band-limit the carrier edges
+
+    @return   A numpy array of shape (n_hydrophones, stop_index - start_index)
+    """
+    num_samples = stop_index - start_index
+    if num_samples <= 0:
+        # a segment that ends before it starts, such as one past the end of the measurement
+        return np.empty((len(delays), 0), dtype=global_vars.analog_dtype)
+    signals = np.empty((len(delays), num_samples), dtype=global_vars.analog_dtype)
+
+    chunk_size = min(GENERATION_CHUNK_SIZE, num_samples)
+    local_time = np.empty((len(delays), chunk_size))
+    carrier_phase = np.empty((len(delays), chunk_size))
+    carrier_on = np.empty((len(delays), chunk_size), dtype=bool)
+    below_duty_cycle = np.empty((len(delays), chunk_size), dtype=bool)
+
+    for chunk_start in range(0, num_samples, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, num_samples)
+        width = chunk_stop - chunk_start
+
+        # time elapsed since the wavefront reached each hydrophone
+        time = local_time[:, :width]
+        np.subtract(np.arange(start_index + chunk_start, start_index + chunk_stop) / fs,
+                    delays[:, np.newaxis], out=time)
+
+        # the carrier is on for the first duty_cycle fraction of every carrier period
+        # and the hydrophone hears nothing before the wavefront arrives
+        on = carrier_on[:, :width]
+        phase = carrier_phase[:, :width]
+        np.greater_equal(time, 0, out=on)
+        np.multiply(time, global_vars.carrier_frequency, out=phase)
+        np.mod(phase, 1, out=phase)
+        np.less(phase, duty_cycle, out=below_duty_cycle[:, :width])
+        on &= below_duty_cycle[:, :width]
+
+        # the phase is always computed in double precision so that long measurements
+        # keep their timing, and is only narrowed to the analog dtype by np.sin
+        time *= 2 * np.pi * global_vars.signal_frequency
+        chunk = signals[:, chunk_start:chunk_stop]
+        np.sin(time, out=chunk)
+        chunk *= on
+
+    if band_limited:
+        _band_limit_edges(signals, delays, start_index, stop_index, duty_cycle, fs)
+
+    return signals
+
+
+def _band_limit_edges(signals, delays, start_index, stop_index, duty_cycle, fs):
+    """
+    Replaces the hard carrier edges close to each edge with a Hann windowed sinc step
+    (the integral of a sinc pulse) centered at the exact edge time. Modifies signals in
+    place, by adding the carrier correction times the sine wave at the samples near each edge.
+    """
+    carrier_period = 1 / global_vars.carrier_frequency
+    offsets = np.arange(-EDGE_HALF_WIDTH, EDGE_HALF_WIDTH)
+
+    # every ping that could have an edge inside the generated range
+    first_ping = int(np.floor((start_index / fs - max(delays)) / carrier_period)) - 1
+    last_ping = int(np.ceil((stop_index / fs - min(delays)) / carrier_period)) + 1
+    first_ping = max(first_ping, 0)
+
+    rows = np.arange(len(delays))[:, np.newaxis]
+    for ping in range(first_ping, last_ping):
+        rise_times = delays + ping * carrier_period
+        fall_times = rise_times + duty_cycle * carrier_period
+
+        for (edge_times, sign) in ((rise_times, 1), (fall_times, -1)):
+            indices = np.ceil(edge_times * fs).astype(int)[:, np.newaxis] + offsets
+            # time from the edge in units of samples
+            x = indices - edge_times[:, np.newaxis] * fs
+
+            hard_step = (x >= 0).astype(float)
+            smooth_step = 0.5 + special.sici(np.pi * x)[0] / np.pi
+            window = 0.5 * (1 + np.cos(np.pi * x / EDGE_HALF_WIDTH))
+
+            correction = sign * window * (smooth_step - hard_step)
+            in_range = (indices >= start_index) & (indices < stop_index)
+            edge_rows = np.broadcast_to(rows, indices.shape)[in_range]
+            edge_indices = indices[in_range]
+
+            # the signal is the sine wave times the carrier, so a carrier correction adds
+            # the correction times the sine wave
+            sine = np.sin(2 * np.pi * global_vars.signal_frequency * (edge_indices / fs - delays[edge_rows]))
+            np.add.at(signals, (edge_rows, edge_indices - start_index), correction[in_range] * sine)
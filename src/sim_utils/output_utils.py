@@ -16,6 +16,8 @@ import os
 # initialize to None to better detect errors
 log_level = None
 config = None
+# directory the log files are written to
+log_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "log")
 
 
 def create_output_file(frame_data, pickle_path, xml_path):
@@ -31,10 +33,13 @@ def create_output_file(frame_data, pickle_path, xml_path):
     outputFile.write(dom.toprettyxml())
 
 
-def configure_logger(log_lvl, fname):
-    global log_level, log_fname
+def configure_logger(log_lvl, fname, directory=None):
+    # the log directory is kept unless a new one is given
+    global log_level, log_fname, log_dir
     log_fname = fname
     log_level = log_lvl
+    if directory is not None:
+        log_dir = directory
 
 
 def initialize_logger(logger_name):
@@ -46,12 +51,11 @@ def initialize_logger(logger_name):
         name = logger_name
         file_mode = 'a'
 
-    dir_path = os.path.dirname(os.path.realpath(__file__))
     # check if log directory exists. If not, create it
-    if not os.path.exists(dir_path + '/../../log'):
-        os.makedirs(dir_path + '/../../log')
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
 
-    filename = dir_path + "/../../log/%s.log" % log_fname
+    filename = os.path.join(log_dir, "%s.log" % log_fname)
     # create logger
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
@@ -36,6 +36,23 @@ def plot_calculated_positions(position_list, initial_guess, sigma):
     ax2.legend(loc='lower left')
     f.colorbar(h[3], ax=ax2)
 
+def plot_track(true_positions, calculated_positions, tracked_positions):
+    '''
+    plots the XY path of the pinger against the positions calculated from every
+    ping and the positions tracked across pings
+    '''
+    plt.figure()
+    for positions, label, style in ((true_positions, "Pinger", '-'),
+                                    (calculated_positions, "Calculated", 'x'),
+                                    (tracked_positions, "Tracked", '.-')):
+        cart = [cyl_to_cart(pos) if type(pos).__name__ == "CylindricalPosition" else pos for pos in positions]
+        plt.plot([pos.x for pos in cart], [pos.y for pos in cart], style, label=label)
+
+    plt.xlabel("x (m)")
+    plt.ylabel("y (m)")
+    plt.title("Pinger Track")
+    plt.legend()
+
 def plot_signals(*signals, title="Hydrophone Signals"):
     plt.figure()
     i=0
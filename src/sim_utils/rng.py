@@ -0,0 +1,44 @@
+## @package rng
+#  Reproducible random number streams for the simulation
+#
+#  Every random stream is derived from a single root seed (global_vars.seed) and
+#  a spawn key, so the noise drawn for iteration k of stage i only depends on
+#  (seed, k, i). Iteration k gives the same output whether it runs in order,
+#  alone or in a separate process, and no two streams are correlated.
+import numpy as np
+import global_vars
+from sim_utils.output_utils import initialize_logger
+
+# spawn key offset of the depth sensor stream. Far above any stage index
+DEPTH_SENSOR_STREAM = 2**16
+
+
+def root_seed():
+    '''
+    The root seed of the simulation. If global_vars.seed is not set, a seed is
+    drawn from the OS once and logged so that the run can be replayed
+    '''
+    if global_vars.seed is None:
+        global_vars.seed = np.random.SeedSequence().entropy
+        initialize_logger(__name__).info("Using random seed %d" % global_vars.seed)
+    return global_vars.seed
+
+
+def generator(*spawn_key):
+    '''
+    @param spawn_key    non-negative integers identifying the stream, e.g. (iteration, stage_index)
+    @return             a numpy Generator seeded from the root seed and spawn_key
+    '''
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(root_seed(), spawn_key=spawn_key)))
+
+
+def seed_iteration(stages, iteration):
+    '''
+    gives every stage that accepts a generator (through set_rng) its own stream for
+    this iteration, and reseeds the depth sensor
+    '''
+    for stage_index, stage in enumerate(stages):
+        if hasattr(stage, "set_rng"):
+            stage.set_rng(generator(iteration, stage_index))
+
+    global_vars.depth_sensor_rng = generator(iteration, DEPTH_SENSOR_STREAM)
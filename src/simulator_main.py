@@ -30,6 +30,9 @@ if __name__ == "__main__":
                         help='Experiment name to run')
     parser.add_argument('-n', '--num_iterations', default=1, type=int,
                         help="The number of iterations that the simulation performs through the component chain")
+    parser.add_argument('-s', '--seed', type=int,
+                        help="Root seed of the simulation's random streams. Iterations are reproducible for a given seed.\n" +
+                            "If not passed, a random seed is used and logged")
     parser.add_argument('-o', '--outfile_name',
                         default="sim_output_" + datetime.now().strftime("%d-%m-%Y_%H_%M_%S"), type=str,
                         help="The file name for the simulator output.\n" +
@@ -42,6 +45,7 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
     global_vars.num_iterations = args.num_iterations
+    global_vars.seed = args.seed
 
     ##################################################
     # Dynamic Configuration
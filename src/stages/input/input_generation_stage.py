@@ -1,28 +1,93 @@
-from sim_utils.input_generation import InputGeneration
+from sim_utils.input_generation import (generate_hydrophone_signals, generate_ping_segment,
+                                        cached_hydrophone_signals, stream_hydrophone_signals)
 import global_vars
 import numpy as np
 
 
 class InputGenerationStage:
-    
-    def __init__(self, measurement_period, duty_cycle):
+    '''
+    generates the signal received by every hydrophone as a single
+    (n_hydrophones, n_samples) array
+
+    In sparse mode only the samples around the first ping are generated and
+    the stage outputs a SignalSegment instead. The noise, ADC and capture
+    trigger stages then only process the samples in the segment. With noise,
+    the ADC levels only match the dense path if the ADC has a fixed full_scale
+    (see IdealADCStage.apply_segment).
+
+    With at_adc_rate set, the signals are generated directly at
+    global_vars.sampling_frequency. The sampling stages after it in a chain are
+    told the rate through output_sampling_frequency (see Chain).
+
+    The clean signal is the same on every iteration for a fixed geometry, so by
+    default it is cached (see cached_hydrophone_signals) and the output is a
+    read-only array shared between iterations.
+
+    When the chain runs in streaming mode, the signals are generated block by
+    block instead and are never cached.
+    '''
+
+    def __init__(self, measurement_period, duty_cycle, sparse=False, padding=1e-3,
+                 at_adc_rate=False, use_cache=True):
+        self.measurement_period = measurement_period
+        self.duty_cycle = duty_cycle
+        self.sparse = sparse
+        # time kept on either side of the ping in sparse mode
+        self.padding = padding
+        self.at_adc_rate = at_adc_rate
+        self.use_cache = use_cache
+
         # as many channels as there are hydrophones
         self.num_components = len(global_vars.hydrophone_positions)
 
-        # Create InputGeneration
-        self.components = []
-        # add hydrophone position based on component index
-        for i in range(self.num_components):
-            hydrophone_position = global_vars.hydrophone_positions[i]
-            self.components.append(
-                InputGeneration(hydrophone_position, measurement_period, duty_cycle)
-            )
+    @property
+    def output_sampling_frequency(self):
+        if self.at_adc_rate:
+            return global_vars.sampling_frequency
+        return global_vars.continuous_sampling_frequency
+
+    @property
+    def owns_output(self):
+        # cached signals are shared between iterations, fresh ones can be modified downstream
+        return not self.use_cache
 
     def apply(self, sim_signal):
-        return tuple(
-            component.apply(sim_signal)
-            for component in self.components
+        if self.use_cache:
+            return cached_hydrophone_signals(
+                self.measurement_period,
+                self.duty_cycle,
+                self.sparse,
+                self.padding,
+                self.at_adc_rate
+            )
+
+        if self.sparse:
+            return generate_ping_segment(
+                global_vars.hydrophone_positions,
+                self.measurement_period,
+                self.duty_cycle,
+                self.padding,
+                self.at_adc_rate
+            )
+
+        return generate_hydrophone_signals(
+            global_vars.hydrophone_positions,
+            self.measurement_period,
+            self.duty_cycle,
+            self.at_adc_rate
+        )
+
+    def stream(self, blocks, block_size):
+        # this is the start of the chain, so there are no input blocks
+        return stream_hydrophone_signals(
+            global_vars.hydrophone_positions,
+            self.measurement_period,
+            self.duty_cycle,
+            block_size,
+            self.sparse,
+            self.padding,
+            self.at_adc_rate
         )
 
     def write_frame(self, frame):
-        pass
\ No newline at end of file
+        pass
@@ -5,7 +5,9 @@ Contains a variety of helper functions to be used across all position calculatio
 @date Oct 21, 2020
 '''
 import numpy as np
+import copy
 from scipy import optimize
+from functools import lru_cache
 #from simulator_main import sim_config as global_vars
 import global_vars
 from sim_utils.common_types import *
@@ -77,7 +79,7 @@ def gradient_descent(func, starting_params, args=(), step_size=0.5, termination_
     return params
 
 
-def nelder_mead(func, starting_params, args=()):
+def nelder_mead(func, starting_params, args=(), xatol=1e-4, fatol=1e-4):
     '''
     @brief Implements nelder mead optimization on the given function
 
@@ -90,10 +92,14 @@ def nelder_mead(func, starting_params, args=()):
                             be inputted as a numpy array
     @param args             A tuple containing any other arguments that should be inputted
                             to the function (constants, non-numerical parameters, etc.)
+    @param xatol            The change in the parameters below which the optimization stops
+    @param fatol            The change in the function value below which the optimization
+                            stops. Both tolerances must be met
     @return                 A numpy array containing the value of arguments that will minimize 
                             func
     '''
-    results = optimize.minimize(func, starting_params, args=args, method='Nelder-Mead')
+    results = optimize.minimize(func, starting_params, args=args, method='Nelder-Mead',
+                                options={"xatol": xatol, "fatol": fatol})
 
     if (not results.success):
         logger.warning(results.message)
@@ -103,8 +109,198 @@ def nelder_mead(func, starting_params, args=()):
     return results.x
 
 
-def newton_gauss(func, starting_params, args=()):
-    pass
+def newton_gauss(func, starting_params, args=(), jacobian=None, damping=1e-3, termination_step=1e-9,
+                    max_iter=100, delta_x=1e-6):
+    '''
+    @brief Implements damped Gauss-Newton (Levenberg-Marquardt) optimization, minimizing the
+           sum of squares of the given residuals
+
+    Every iteration solves (J^T J + damping*diag(J^T J)) step = -J^T residuals. A step that
+    does not reduce the sum of squares is retried with ten times the damping, which moves
+    it towards a short gradient descent step, and an accepted step lowers the damping again.
+
+    @param func             A function returning the vector of residuals, rather than their
+                            sum of squares
+    @param starting_params  The initial guess for the function parameters, as a numpy array
+    @param args             A tuple containing any other arguments that should be inputted
+                            to func and jacobian
+    @param jacobian         A function returning the derivative of the residuals with respect
+                            to the parameters, of shape (num_residuals, num_params). It is
+                            calculated numerically if None
+    @param damping          The initial damping factor
+    @param termination_step The size of a step, relative to the parameters, at which the
+                            optimization converges
+    @param max_iter         The maximum amount of iterations the function will take
+    @param delta_x          If jacobian is None, this parameter determines the difference
+                            in input values used when calculating the jacobian numerically
+    @return                 A numpy array containing the value of arguments that will
+                            minimize the sum of squares of func
+    '''
+    params = np.asarray(starting_params, dtype=float)
+    residuals = func(params, *args)
+    cost = residuals @ residuals
+    num_iter = 0
+
+    while num_iter < max_iter:
+        if jacobian is None:
+            jac = get_jacobian(func, params, args, delta_x)
+        else:
+            jac = jacobian(params, *args)
+
+        normal_matrix = jac.T @ jac
+        gradient = jac.T @ residuals
+        # keeps the damped matrix invertible if a parameter has no effect
+        scaling = np.diag(np.maximum(np.diag(normal_matrix), np.finfo(float).tiny))
+        num_iter += 1
+
+        while True:
+            try:
+                step = -np.linalg.solve(normal_matrix + damping*scaling, gradient)
+            except np.linalg.LinAlgError:
+                # the least squares step, for the rare pings where the damped matrix is still singular
+                step = -np.linalg.pinv(normal_matrix + damping*scaling) @ gradient
+            new_residuals = func(params + step, *args)
+            new_cost = new_residuals @ new_residuals
+
+            if new_cost <= cost or damping > 1e10:
+                break
+            damping *= 10
+
+        if new_cost > cost:
+            # no step along the gradient reduces the cost any further
+            logger.info("Newton Gauss optimization stalled after %d iterations" %num_iter)
+            return params
+
+        params = params + step
+        residuals = new_residuals
+        cost = new_cost
+        damping /= 10
+
+        if np.linalg.norm(step) <= termination_step*(np.linalg.norm(params) + termination_step):
+            break
+    else:
+        logger.warning("maximum iteration number reached")
+
+    logger.info("Newton Gauss optimization converged with %d iterations" %num_iter)
+    return params
+
+
+def batch_newton_gauss(func, starting_params, jacobian, damping=1e-3, termination_step=1e-9, max_iter=100,
+                        termination_cost=None):
+    '''
+    @brief Implements newton_gauss on a batch of independent least squares problems at once
+
+    Every iteration takes one damped step for every problem that has not converged yet, as a
+    single vectorized operation. A step that does not reduce the sum of squares is rejected and
+    the damping of that problem raised for the next iteration. Problems leave the batch once
+    they converge, so the remaining iterations only cost as much as the problems left.
+
+    @param func             A function taking an (n, num_params) array of parameters and the
+                            indices of the n problems they belong to, and returning the
+                            (n, num_residuals) residuals of those problems
+    @param starting_params  The initial guesses, a numpy array of shape (num_problems, num_params)
+    @param jacobian         A function taking the same arguments as func and returning the
+                            (n, num_residuals, num_params) derivatives of the residuals
+    @param damping          The initial damping factor
+    @param termination_step The size of a step, relative to the parameters, at which a problem
+                            converges
+    @param max_iter         The maximum amount of iterations
+    @param termination_cost If given, every problem stops once one problem has converged or
+                            stalled with a sum of squares at or below it. For several starts of the same problem,
+                            where any good enough solution will do
+    @return                 The (num_problems, num_params) parameters minimizing the sum of
+                            squares of every problem, and a boolean array flagging the problems
+                            that converged within max_iter. Problems that stalled, or were stopped
+                            by termination_cost before converging, are flagged False
+    '''
+    params = np.array(starting_params, dtype=float)
+    num_params = params.shape[-1]
+    active = np.arange(len(params))
+
+    residuals = func(params, active)
+    cost = np.sum(residuals**2, axis=-1)
+    damping = np.full(len(params), float(damping))
+    converged = np.zeros(len(params), dtype=bool)
+    num_stalled = 0
+    num_iter = 0
+
+    while len(active) and num_iter < max_iter:
+        jac = jacobian(params[active], active)
+        jac_t = np.swapaxes(jac, -1, -2)
+        normal_matrix = jac_t @ jac
+        gradient = jac_t @ residuals[active][..., np.newaxis]
+        # keeps the damped matrix invertible if a parameter has no effect
+        scaling = np.maximum(np.diagonal(normal_matrix, axis1=-2, axis2=-1), np.finfo(float).tiny)
+        damped_matrix = normal_matrix + (damping[active, np.newaxis]*scaling)[..., np.newaxis]*np.eye(num_params)
+
+        try:
+            step = -np.linalg.solve(damped_matrix, gradient)[..., 0]
+        except np.linalg.LinAlgError:
+            # the least squares step, for the rare batches where a damped matrix is still singular
+            step = -(np.linalg.pinv(damped_matrix) @ gradient)[..., 0]
+        new_params = params[active] + step
+        new_residuals = func(new_params, active)
+        new_cost = np.sum(new_residuals**2, axis=-1)
+
+        improved = new_cost <= cost[active]
+        accepted = active[improved]
+        params[accepted] = new_params[improved]
+        residuals[accepted] = new_residuals[improved]
+        cost[accepted] = new_cost[improved]
+        damping[active] = np.where(improved, damping[active]/10, damping[active]*10)
+        num_iter += 1
+
+        small_step = (np.linalg.norm(step, axis=-1)
+                      <= termination_step*(np.linalg.norm(new_params, axis=-1) + termination_step))
+        # converged once the steps stop mattering. A problem also stops once no step along the
+        # gradient reduces its cost
+        done_converged = improved & small_step
+        stalled = ~improved & (damping[active] > 1e10)
+        if np.any(stalled):
+            # rounding can keep the cost of a problem already at its minimum from improving. It
+            # has converged if its undamped Gauss-Newton step is as small as a converged step, or
+            # would lower the cost by a negligible fraction
+            gauss_newton_step = (np.linalg.pinv(normal_matrix[stalled]) @ gradient[stalled])[..., 0]
+            predicted_decrease = np.sum(gauss_newton_step*gradient[stalled][..., 0], axis=-1)
+            stalled_params = params[active[stalled]]
+            at_minimum = ((np.linalg.norm(gauss_newton_step, axis=-1)
+                           <= termination_step*(np.linalg.norm(stalled_params, axis=-1) + termination_step))
+                          | (predicted_decrease <= termination_step*cost[active[stalled]]))
+            done_converged[stalled] = at_minimum
+            stalled[stalled] = ~at_minimum
+        done = done_converged | stalled
+        converged[active[done_converged]] = True
+        num_stalled += np.count_nonzero(stalled)
+        if termination_cost is not None and np.any(cost[active[done]] <= termination_cost):
+            logger.debug("Stopped %d problems early" % np.count_nonzero(~done))
+            active = active[:0]
+            break
+        active = active[~done]
+
+    if len(active):
+        logger.warning("maximum iteration number reached for %d of %d problems" %(len(active), len(params)))
+    if num_stalled:
+        logger.info("%d of %d problems stalled before converging" %(num_stalled, len(params)))
+
+    logger.info("Batched Newton Gauss optimization finished after %d iterations" %num_iter)
+    return params, converged
+
+
+def positive_range(pinger_pos):
+    '''
+    @brief  mirrors polar positions with a negative range through the origin, which newton gauss
+            can step to, so every range is positive, and wraps every angle into (-pi, pi], as
+            the angle can wind any number of turns during the solve
+
+    @param pinger_pos   array of (r, phi) positions on the last axis
+    '''
+    pinger_pos = np.asarray(pinger_pos, dtype=float)
+    r, phi = pinger_pos[..., 0], pinger_pos[..., 1]
+
+    phi = np.where(r < 0, phi + np.pi, phi)
+    phi = np.angle(np.exp(1j*phi))
+
+    return np.stack((np.abs(r), phi), axis=-1)
 
 
 def get_grad(func, params, args, delta_x):
@@ -142,6 +338,23 @@ def get_partial_derivative(func, params, args, var_index, delta_x):
     return (func(params + delta_params, *args) - func(params, *args))/delta_x
 
 
+def get_jacobian(func, params, args, delta_x):
+    '''
+    @brief Calculates the jacobian of a vector function numerically.
+
+    @param func     The function for which the jacobian is calculated
+    @param params   The variable values at which the jacobian is calculated
+    @param args     A tuple containing any other arguments that should be inputted to the 
+                    function (constants, non-numerical parameters, etc.)
+    @param delta_x  The amount each parameter is adjusted by to find the numerical jacobian
+    @return         A numpy array of shape (len(func(params)), len(params))
+    '''
+    values = func(params, *args)
+
+    return np.stack([(func(params + delta_params, *args) - values)/delta_x
+                     for delta_params in delta_x*np.eye(len(params))], axis=-1)
+
+
 def tdoa_function_3D(pinger_pos, hydrophone_pos, is_polar):
     '''
     @brief  calculates the time difference of arrival (TDOA) of the sound signal between the
@@ -175,6 +388,158 @@ def tdoa_function_3D(pinger_pos, hydrophone_pos, is_polar):
 
     return (pinger_distance - delta_d)/global_vars.speed_of_sound
 
+class TDOAObjective:
+    '''
+    The NLS objective for a single set of measured TDOA values, evaluated for every
+    hydrophone in one vectorized expression.
+
+    It models the same function as summing tdoa_function_3D over the hydrophones, but
+    the hydrophone positions are converted to cartesian coordinates once, and the depth
+    sensor is read once when the objective is built rather than on every evaluation, so
+    the minimizer sees a deterministic function.
+
+    Pinger positions may carry leading batch dimensions, (..., 2), in which case one
+    value is returned per position. The TDOA values and depth may carry the same leading
+    dimensions, to evaluate a batch of independent solves at once.
+    '''
+
+    def __init__(self, hydrophone_tdoas, is_polar, depth=None, hydrophone_positions=None):
+        '''
+        @param hydrophone_tdoas     t0 - ti for every hydrophone but hydrophone 0, in the
+                                    order of the hydrophone positions
+        @param is_polar             whether the objective takes (r, phi) or (x, y)
+        @param depth                the pinger depth, or an array with one per TDOA set.
+                                    Read from the depth sensor if None
+        @param hydrophone_positions defaults to global_vars.hydrophone_positions
+        '''
+        if hydrophone_positions is None:
+            hydrophone_positions = global_vars.hydrophone_positions
+
+        self.tdoas = np.asarray(hydrophone_tdoas, dtype=float)
+        self.is_polar = is_polar
+        self.depth = global_vars.depth_sensor_reading() if depth is None else depth
+        self.speed_of_sound = global_vars.speed_of_sound
+
+        hydrophones = hydrophone_array(tuple(hydrophone_positions))[1:]
+        self.hydrophone_x, self.hydrophone_y = hydrophones[:, 0], hydrophones[:, 1]
+        # |p - h|^2 = r^2 - 2 p.h + |h|^2 for the XY plane, so only the dot product
+        # depends on both the pinger and the hydrophone
+        self.hydrophone_x_2 = -2*self.hydrophone_x
+        self.hydrophone_y_2 = -2*self.hydrophone_y
+        depth = np.asarray(self.depth, dtype=float)[..., np.newaxis]
+        self.depth_2 = depth**2
+        self.hydrophone_offsets = self.hydrophone_x**2 + self.hydrophone_y**2 + (depth - hydrophones[:, 2])**2
+
+    def select(self, index):
+        '''
+        @brief  the objective for some of the TDOA sets of a batch, with the TDOA values and
+                depths indexed on their leading dimension
+        '''
+        selected = copy.copy(self)
+        selected.tdoas = self.tdoas[index]
+        if np.ndim(self.depth):
+            selected.depth = self.depth[index]
+            selected.depth_2 = self.depth_2[index]
+            selected.hydrophone_offsets = self.hydrophone_offsets[index]
+
+        return selected
+
+    def pinger_xy(self, pinger_pos):
+        pinger_pos = np.asarray(pinger_pos, dtype=float)
+        if self.is_polar:
+            return pinger_pos[..., 0]*np.cos(pinger_pos[..., 1]), pinger_pos[..., 0]*np.sin(pinger_pos[..., 1])
+        return pinger_pos[..., 0], pinger_pos[..., 1]
+
+    def pinger_range(self, pinger_pos):
+        pinger_pos = np.asarray(pinger_pos, dtype=float)
+        if self.is_polar:
+            return pinger_pos[..., 0]
+        return np.sqrt(pinger_pos[..., 0]**2 + pinger_pos[..., 1]**2)
+
+    def distances(self, x, y):
+        '''
+        @return the distance from the pinger at (x, y) to hydrophone 0, and to every other
+                hydrophone on the last axis
+        '''
+        x = np.asarray(x)[..., np.newaxis]
+        y = np.asarray(y)[..., np.newaxis]
+        range_2 = x*x + y*y
+
+        pinger_distance = np.sqrt(range_2 + self.depth_2)
+        delta_d = np.sqrt(self.hydrophone_offsets + range_2 + x*self.hydrophone_x_2 + y*self.hydrophone_y_2)
+
+        return pinger_distance, delta_d
+
+    def expected_tdoas(self, pinger_pos):
+        '''
+        @return the modelled t0 - ti for every hydrophone, on the last axis
+        '''
+        pinger_distance, delta_d = self.distances(*self.pinger_xy(pinger_pos))
+
+        return (pinger_distance - delta_d)/self.speed_of_sound
+
+    def jacobian(self, pinger_pos):
+        '''
+        @return the derivative of the residuals with respect to the pinger position
+                parameters, of shape (..., M-1, 2)
+        '''
+        pinger_pos = np.asarray(pinger_pos, dtype=float)
+        x, y = self.pinger_xy(pinger_pos)
+        pinger_distance, delta_d = self.distances(x, y)
+        x = np.asarray(x)[..., np.newaxis]
+        y = np.asarray(y)[..., np.newaxis]
+
+        # the residuals fall as the expected tdoas rise
+        d_x = ((x - self.hydrophone_x)/delta_d - x/pinger_distance)/self.speed_of_sound
+        d_y = ((y - self.hydrophone_y)/delta_d - y/pinger_distance)/self.speed_of_sound
+
+        if self.is_polar:
+            phi = pinger_pos[..., 1, np.newaxis]
+            # x = r*cos(phi), y = r*sin(phi)
+            return np.stack((d_x*np.cos(phi) + d_y*np.sin(phi), x*d_y - y*d_x), axis=-1)
+        return np.stack((d_x, d_y), axis=-1)
+
+    def residuals(self, pinger_pos):
+        return self.tdoas - self.expected_tdoas(pinger_pos)
+
+    def __call__(self, pinger_pos):
+        residuals = self.residuals(pinger_pos)
+        # keeps the minimizer within 50m, once for every hydrophone like get_squared_error_sum
+        penalty = self.tdoas.shape[-1]*1e6*np.heaviside(self.pinger_range(pinger_pos) - 50, 0.5)
+
+        return np.sum(residuals**2, axis=-1) + penalty
+
+
+@lru_cache(maxsize=8)
+def hydrophone_array(hydrophone_positions):
+    '''
+    @brief  converts a tuple of hydrophone positions to an (M, 3) array of cartesian
+            coordinates. The array is shared between callers and is read only
+    '''
+    positions = np.array([
+        cyl_to_cart(position) if type(position) == CylindricalPosition else position
+        for position in hydrophone_positions
+    ], dtype=float)
+
+    positions.setflags(write=False)
+    return positions
+
+
+def reference_tdoas(tdoa_matrix):
+    '''
+    @brief  reduces a matrix of pairwise TDOA values to the TDOA of every hydrophone
+            relative to hydrophone 0, averaging over every pair
+
+    @param tdoa_matrix  (M, M) antisymmetric array holding ti - tj at [i, j]
+    @return             tuple of the M-1 values t0 - ti, in hydrophone order
+    '''
+    tdoa_matrix = np.asarray(tdoa_matrix)
+    # least squares estimate of every arrival time, up to a shared offset
+    arrival_times = tdoa_matrix.mean(axis=1)
+
+    return tuple(arrival_times[0] - arrival_times[1:])
+
+
 def plane_wave_prop_delay(params, sensor_pos, use_depth_sensor=False):
     # need to convert sensor position to cartesian
     if (type(sensor_pos) == CylindricalPosition):
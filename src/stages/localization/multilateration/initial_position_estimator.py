@@ -1,21 +1,22 @@
-from components import position_calc
-from stages.localization.localization_utils import nelder_mead
 import global_vars
-from stages.localization.multilateration import NLSPositionCalc
-from sim_utils.common_types import PolarPosition, OptimizationType
+from stages.localization.multilateration.linear import LinearPositionCalc
+from sim_utils.common_types import PolarPosition
 
 class InitialPositionEstimator:
     '''
     Computes an initial position for the pinger
+
+    The closed form LinearPositionCalc solution is written to global_vars.initial_guess and the
+    TDOA values are passed on unchanged, to be refined by an NLSPositionCalc constructed with
+    guess_at_init=False
     '''
 
     def __init__(self, identifier = "Initial Position Estimator"):
         self.identifier = identifier
+        self.linear = LinearPositionCalc(is_polar=True)
 
     def apply(self, sim_signal):
-        nls = NLSPositionCalc(optimization_type=OptimizationType.nelder_mead)
-
-        position_estimate = nls.apply(sim_signal)
+        position_estimate = self.linear.apply(sim_signal)
 
         global_vars.initial_guess = PolarPosition(position_estimate.r, position_estimate.phi)
 
@@ -0,0 +1,128 @@
+'''@package linear
+The component modelling a closed form, linearized solution of the position calculation problem,
+using the pinger depth from the depth sensor.
+
+'''
+
+from stages.localization import localization_utils
+from functools import lru_cache
+import numpy as np
+import global_vars
+from sim_utils.common_types import *
+
+
+class LinearPositionCalc:
+    '''
+    LinearPositionCalc calculates the position of the pinger from hydrophone Time Difference Of
+    Arrival (TDOA) without iterating, by spherical intersection.
+
+    With hydrophone 0 at the origin, d0 the distance from the pinger to hydrophone 0 and
+    di = d0 - c*(t0 - ti) the distance to hydrophone i, expanding di^2 = |p - hi|^2 gives one
+    equation per hydrophone that is linear in the XY position of the pinger:
+
+        2*xi*x + 2*yi*y = |hi|^2 - 2*zi*z - (c*(t0-ti))^2 + 2*c*(t0-ti)*d0
+
+    The least squares solution of these is a linear function of d0, through the pseudo inverse
+    of the hydrophone XY positions, which only depends on the array and is computed once.
+    Substituting it into d0^2 = x^2 + y^2 + z^2, with z from the depth sensor, leaves a quadratic
+    in d0. Of its roots, the one whose position best fits the TDOA values is kept.
+
+    The solution is exact for noiseless TDOA values, but noise makes the range less reliable than
+    the angle, so it is best used as a starting point for NLSPositionCalc (see
+    InitialPositionEstimator).
+    '''
+
+    def __init__(self, is_polar=True):
+        '''
+        @brief class constructor
+
+        @param is_polar     whether the position is returned as a CylindricalPosition or a
+                            CartesianPosition
+        '''
+        self.component_name = "LinearPositionCalc"
+        self.id = "Linear"
+        self.is_polar = is_polar
+
+    def apply(self, sim_signal):
+        '''
+        @brief Applies the simulation signal to the component and returns its outputs.
+
+        @param sim_signal   A tuple of the t0 - ti TDOA values of every hydrophone after hydrophone 0,
+                            in the order of global_vars.hydrophone_positions, or an (M, M) matrix of
+                            pairwise TDOA values, like NLSPositionCalc
+        '''
+        if np.ndim(sim_signal) == 2:
+            sim_signal = localization_utils.reference_tdoas(sim_signal)
+
+        depth = global_vars.depth_sensor_reading()
+        x, y = spherical_intersection(sim_signal, depth)
+
+        if self.is_polar:
+            return CylindricalPosition(np.sqrt(x**2 + y**2), np.arctan2(y, x), depth)
+        else:
+            return CartesianPosition(x, y, depth)
+
+    def write_frame(self, frame):
+        return {}
+
+
+def spherical_intersection(hydrophone_tdoas, depth, hydrophone_positions=None):
+    '''
+    @brief  calculates the XY position of the pinger in closed form from its depth and
+            the TDOA values of every hydrophone relative to hydrophone 0
+
+    @param hydrophone_tdoas     t0 - ti for every hydrophone after hydrophone 0
+    @param depth                the depth of the pinger relative to hydrophone 0
+    @param hydrophone_positions defaults to global_vars.hydrophone_positions
+    @return                     numpy array with the x and y position of the pinger
+    '''
+    if hydrophone_positions is None:
+        hydrophone_positions = global_vars.hydrophone_positions
+
+    inverse, offsets, heights = intersection_matrices(tuple(hydrophone_positions))
+    range_differences = global_vars.speed_of_sound*np.asarray(hydrophone_tdoas, dtype=float)
+
+    # xy = position + direction*d0
+    position = inverse @ (offsets - 2*heights*depth - range_differences**2)
+    direction = inverse @ (2*range_differences)
+
+    # d0^2 = |position + direction*d0|^2 + depth^2, or a*d0^2 + 2*b*d0 + c = 0
+    a = direction @ direction - 1
+    b = position @ direction
+    c = position @ position + depth**2
+    discriminant = b**2 - a*c
+
+    # a pinger can't be closer than its depth. With noise there may be no such real root, in
+    # which case the range at the closest approach of the two sides is used
+    distances = np.array([])
+    if discriminant >= 0:
+        distances = (-b + np.array([-1, 1])*np.sqrt(discriminant))/a
+        distances = distances[distances >= abs(depth)]
+    if len(distances) == 0:
+        distances = np.array([max(-b/a, abs(depth))])
+
+    candidates = position + direction*distances[:, np.newaxis]
+    if len(candidates) > 1:
+        objective = localization_utils.TDOAObjective(hydrophone_tdoas, False, depth, hydrophone_positions)
+        return candidates[np.argmin(objective(candidates))]
+
+    return candidates[0]
+
+
+@lru_cache(maxsize=8)
+def intersection_matrices(hydrophone_positions):
+    '''
+    @brief  the parts of the spherical intersection equations that only depend on the array
+
+    @return the (2, M-1) pseudo inverse of the hydrophone XY positions, scaled by two, and the
+            squared distance from hydrophone 0 and height of every hydrophone after hydrophone 0
+    '''
+    hydrophones = localization_utils.hydrophone_array(hydrophone_positions)[1:]
+
+    inverse = np.linalg.pinv(2*hydrophones[:, :2])
+    offsets = np.sum(hydrophones**2, axis=-1)
+    heights = hydrophones[:, 2].copy()
+
+    for array in (inverse, offsets, heights):
+        array.setflags(write=False)
+    return inverse, offsets, heights
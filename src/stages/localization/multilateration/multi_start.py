@@ -0,0 +1,160 @@
+'''@package multi_start
+The component modelling a Non-linear Least Squares (NLS) position calculation started from
+several initial guesses, to avoid converging to a local minimum such as the mirror image of the
+pinger position.
+
+'''
+
+from stages.localization import localization_utils
+import numpy as np
+import global_vars
+from sim_utils.common_types import *
+from sim_utils.output_utils import initialize_logger
+
+# create logger object for this module
+logger = initialize_logger(__name__)
+
+SEEDINGS = ("mirrored", "random", "grid")
+
+
+class MultiStartNLSPositionCalc:
+    '''
+    MultiStartNLSPositionCalc solves the same problem as NLSPositionCalc with Newton Gauss, but
+    from num_starts initial guesses, and returns the solution with the smallest residual.
+
+    The first guess is solved on its own. Only if its RMS TDOA residual is above
+    residual_tolerance are the other guesses solved, all together as one vectorized batch that
+    stops as soon as one of them converges below the tolerance. In the common case where the
+    first guess is good, the cost is that of a single solve.
+
+    The guesses are picked by the seeding:
+        mirrored    global_vars.initial_guess, then its reflections through the array axes and
+                    the origin, then evenly spread angles at the same range
+        random      global_vars.initial_guess, then uniformly random positions within r_range
+        grid        the grid positions of grid_index closest to the TDOA values, best first
+
+    After every apply, write_frame returns diagnostics of the solve: the number of starts that
+    were run, the index of the best one, its RMS residual, and whether it converged.
+    '''
+
+    def __init__(self, num_starts=4, seeding="mirrored", residual_tolerance=0.1e-6, grid_index=None,
+                 r_range=(1, 50), max_iter=100):
+        '''
+        @brief class constructor
+
+        @param num_starts           the largest number of initial guesses solved
+        @param seeding              how the guesses are picked, one of SEEDINGS
+        @param residual_tolerance   RMS TDOA residual, in seconds, below which a solution is
+                                    accepted without trying the remaining guesses
+        @param grid_index           a TDOAGridIndex, required for the grid seeding
+        @param r_range              range of the random seeding, in meters
+        @param max_iter             the maximum amount of Newton Gauss iterations
+        '''
+        if num_starts < 1:
+            raise ValueError("num_starts must be at least 1. You inputted " + str(num_starts))
+        if seeding not in SEEDINGS:
+            raise ValueError("seeding must be one of " + str(SEEDINGS) + ". You inputted " + str(seeding))
+        if seeding == "grid" and grid_index is None:
+            raise ValueError("The grid seeding needs a grid_index")
+
+        self.component_name = "MultiStartNLSPositionCalc"
+        self.id = "MultiStartNLS"
+        self.num_starts = num_starts
+        self.seeding = seeding
+        self.residual_tolerance = residual_tolerance
+        self.grid_index = grid_index
+        self.r_range = r_range
+        self.max_iter = max_iter
+        self.rng = np.random.default_rng()
+        self.diagnostics = {}
+
+    def set_rng(self, rng):
+        self.rng = rng
+
+    def apply(self, sim_signal):
+        '''
+        @brief Applies the simulation signal to the component and returns its outputs.
+
+        @param sim_signal   A tuple of the t0 - ti TDOA values of every hydrophone after hydrophone 0,
+                            or an (M, M) matrix of pairwise TDOA values, like NLSPositionCalc
+        '''
+        if np.ndim(sim_signal) == 2:
+            sim_signal = localization_utils.reference_tdoas(sim_signal)
+
+        initial_guess = global_vars.initial_guess
+        if type(initial_guess) == PolarPosition:
+            is_polar = True
+        elif type(initial_guess) == Cartesian2DPosition:
+            is_polar = False
+            initial_guess = cart2d_to_polar(initial_guess)
+        else:
+            raise ValueError("Initial Pinger Position should be either a PolarPosition or Cartesian2DPosition")
+
+        objective = localization_utils.TDOAObjective(sim_signal, is_polar, depth=None)
+        seeds = self.get_seeds(initial_guess, sim_signal, objective.depth)
+        if not is_polar:
+            seeds = seeds[:, :1]*np.stack((np.cos(seeds[:, 1]), np.sin(seeds[:, 1])), axis=-1)
+
+        # all starts share the TDOA values, so the residuals broadcast over the batch
+        termination_cost = len(objective.tdoas)*self.residual_tolerance**2
+        rounds = (seeds[:1], seeds[1:])
+        positions = []
+        converged = []
+        for round_seeds in rounds:
+            if len(round_seeds) == 0:
+                break
+            round_positions, round_converged = localization_utils.batch_newton_gauss(
+                lambda params, index: objective.residuals(params),
+                round_seeds,
+                lambda params, index: objective.jacobian(params),
+                max_iter=self.max_iter,
+                termination_cost=termination_cost
+            )
+            positions.extend(round_positions)
+            converged.extend(round_converged)
+
+            costs = np.sum(objective.residuals(np.array(positions))**2, axis=-1)
+            if np.any(costs <= termination_cost):
+                break
+
+        positions = np.array(positions)
+        if is_polar:
+            positions = localization_utils.positive_range(positions)
+
+        # prefer converged solutions, then the smallest residual
+        best = np.lexsort((costs, ~np.array(converged)))[0]
+        self.diagnostics = {
+            "num_starts": len(positions),
+            "best_start": int(best),
+            "rms_residual": float(np.sqrt(costs[best]/len(objective.tdoas))),
+            "converged": bool(converged[best]),
+        }
+        logger.info("Multi-start NLS ran %d of %d starts" % (len(positions), len(seeds)))
+
+        if is_polar:
+            return CylindricalPosition(positions[best, 0], positions[best, 1], objective.depth)
+        else:
+            return CartesianPosition(positions[best, 0], positions[best, 1], objective.depth)
+
+    def get_seeds(self, initial_guess, hydrophone_tdoas, depth):
+        '''
+        @return (num_starts, 2) array of (r, phi) initial guesses, in the order they are tried
+        '''
+        if self.seeding == "grid":
+            return self.grid_index.seeds(hydrophone_tdoas, depth, k=self.num_starts).reshape(-1, 2)
+
+        if self.seeding == "random":
+            r = self.rng.uniform(*self.r_range, self.num_starts - 1)
+            phi = self.rng.uniform(-np.pi, np.pi, self.num_starts - 1)
+        else:
+            # the reflections through the x axis, the y axis and the origin come first
+            mirrors = np.array([-initial_guess.phi, np.pi - initial_guess.phi, initial_guess.phi + np.pi])
+            num_spread = max(self.num_starts - 4, 0)
+            spread = initial_guess.phi + np.pi/2 + 2*np.pi*np.arange(num_spread)/max(num_spread, 1)
+            phi = np.concatenate((mirrors, spread))[:self.num_starts - 1]
+            r = np.full(len(phi), initial_guess.r)
+
+        return np.concatenate(([[initial_guess.r, initial_guess.phi]], np.stack((r, phi), axis=-1)))
+
+    def write_frame(self, frame):
+        return self.diagnostics
@@ -33,7 +33,7 @@ class NLSPositionCalc:
     https://github.com/ubc-subbots/sound-localization-simulator/blob/master/docs/Position_Calculation_Algorithms.pdf
     '''
 
-    def __init__(self, optimization_type, guess_at_init=True):
+    def __init__(self, optimization_type, guess_at_init=True, grid_index=None):
         '''
         @brief class constructor
 
@@ -47,11 +47,15 @@ class NLSPositionCalc:
         @param initial_data["initial_guess"] 
             The initial guess for the XY plane position of the pinger. The function expects an input of 
             type PolarPosition or Cartesian2DPosition, both defined in common_types.py
+        @param grid_index
+            A TDOAGridIndex. If given, every solve starts from the grid position that best
+            matches the TDOA values, and the initial guess only sets the coordinates used
         '''
         self.component_name = "NLSPositionCalc"
         self.id = "NLS"
         self.optimization_type = optimization_type
         self.guess_at_init = guess_at_init
+        self.grid_index = grid_index
         if guess_at_init:
             self.initial_guess = global_vars.initial_guess
             
@@ -64,46 +68,107 @@ class NLSPositionCalc:
                             specified in the config file. For example, the first value in the tuple will be
                             the TDOA between global_vars.hydrophone_positions[1] and global_vars.hydrophone_positions[0]
                             (specifically t1-t0)
+                            An (M, M) matrix of pairwise TDOA values (see GCCPhatStage) is also
+                            accepted and reduced to the values relative to hydrophone 0
         '''
+        if np.ndim(sim_signal) == 2:
+            sim_signal = localization_utils.reference_tdoas(sim_signal)
+
         if not self.guess_at_init:
             self.initial_guess = global_vars.initial_guess
 
         if type(self.initial_guess) == PolarPosition:
-            self.initial_guess = np.array([self.initial_guess.r, self.initial_guess.phi])
+            initial_guess = np.array([self.initial_guess.r, self.initial_guess.phi])
             self.is_polar = True
         elif type(self.initial_guess) == Cartesian2DPosition:
-            self.initial_guess = np.array([self.initial_guess.x, self.initial_guess.y])
+            initial_guess = np.array([self.initial_guess.x, self.initial_guess.y])
             self.is_polar = False
         else:
             raise ValueError("Initial Pinger Position should be either a PolarPosition or Cartesian2DPosition")
 
+        # reads the depth sensor once, so the same depth is used throughout the solve
+        objective = localization_utils.TDOAObjective(sim_signal, self.is_polar)
+        if self.grid_index is not None:
+            initial_guess = self.grid_index.seeds(sim_signal, objective.depth, is_polar=self.is_polar)
+
         # argument to the minimizer must be a numpy array
         pinger_pos = np.zeros(2)
-        # non-minimized args are packaged in a single tuple
-        args = (self.is_polar, *sim_signal)
 
         if self.optimization_type == OptimizationType.nelder_mead:
-            pinger_pos = localization_utils.nelder_mead(get_squared_error_sum,
-                                                         self.initial_guess, args=args)
+            # the objective is in seconds squared, far below the default tolerances
+            pinger_pos = localization_utils.nelder_mead(objective, initial_guess, xatol=1e-6, fatol=1e-24)
         elif self.optimization_type == OptimizationType.gradient_descent:
-            pinger_pos = localization_utils.gradient_descent(get_squared_error_sum,
-                                                              self.initial_guess, args=args)
-        # elif (self.optimization_type == OptimizationType.newton_gausss):
-        #     pinger_pos = position_calc_utils.newton_gauss(get_squared_error_sum, 
-        #                     self.initial_guess, args=args)
+            pinger_pos = localization_utils.gradient_descent(objective, initial_guess)
+        elif self.optimization_type == OptimizationType.newton_gauss:
+            pinger_pos = localization_utils.newton_gauss(objective.residuals, initial_guess,
+                                                          jacobian=objective.jacobian)
+            if self.is_polar:
+                pinger_pos = localization_utils.positive_range(pinger_pos)
         else:
             raise ValueError("Optimization type must be of type OptimizationType. You inputted " +
                              str(self.optimization_type))
 
         if self.is_polar:
-            return CylindricalPosition(pinger_pos[0], pinger_pos[1], global_vars.depth_sensor_reading())
+            return CylindricalPosition(pinger_pos[0], pinger_pos[1], objective.depth)
         else:
-            return CartesianPosition(pinger_pos[0], pinger_pos[1], global_vars.depth_sensor_reading())
+            return CartesianPosition(pinger_pos[0], pinger_pos[1], objective.depth)
 
     def write_frame(self, frame):
         return {}
 
 
+def batch_position_calc(hydrophone_tdoas, initial_guess, depth=None, max_iter=100, grid_index=None):
+    '''
+    @brief  calculates the pinger position for a batch of TDOA sets at once, with a vectorized
+            Newton Gauss solve. This is much faster than applying an NLSPositionCalc to every
+            set in turn, for accuracy studies over many noise realizations
+
+    @param hydrophone_tdoas     (n_trials, M-1) array with the t0 - ti TDOA values of every
+                                trial, ordered like the tuples taken by NLSPositionCalc
+    @param initial_guess        A PolarPosition or Cartesian2DPosition, shared by every trial
+                                or holding an array with one guess per trial
+    @param depth                The pinger depth, or an array with one per trial. The depth
+                                sensor is read once per trial if None
+    @param max_iter             The maximum amount of iterations
+    @param grid_index           A TDOAGridIndex. If given, every trial starts from the grid
+                                position closest to its TDOA values, at the mean depth, and the
+                                initial guess only sets the coordinates used
+    @return                     (n_trials, 2) array of positions in the coordinates of the
+                                initial guess, and a boolean array flagging the trials that
+                                converged
+    '''
+    hydrophone_tdoas = np.atleast_2d(np.asarray(hydrophone_tdoas, dtype=float))
+    num_trials = len(hydrophone_tdoas)
+
+    if type(initial_guess) == PolarPosition:
+        is_polar = True
+    elif type(initial_guess) == Cartesian2DPosition:
+        is_polar = False
+    else:
+        raise ValueError("Initial Pinger Position should be either a PolarPosition or Cartesian2DPosition")
+
+    if depth is None:
+        depth = np.array([global_vars.depth_sensor_reading() for i in range(num_trials)])
+
+    objective = localization_utils.TDOAObjective(hydrophone_tdoas, is_polar, depth)
+    if grid_index is not None:
+        starting_params = grid_index.seeds(hydrophone_tdoas, np.mean(depth), is_polar=is_polar)
+    else:
+        starting_params = np.broadcast_to(np.stack(np.broadcast_arrays(*initial_guess), axis=-1), (num_trials, 2))
+
+    positions, converged = localization_utils.batch_newton_gauss(
+        lambda params, index: objective.select(index).residuals(params),
+        starting_params,
+        lambda params, index: objective.select(index).jacobian(params),
+        max_iter=max_iter
+    )
+
+    if is_polar:
+        positions = localization_utils.positive_range(positions)
+
+    return positions, converged
+
+
 def get_squared_error_sum(pinger_pos, is_polar, *hydrophone_tdoas):
     '''
     @brief  calculates the sum of error squared (sum[(expected-actual)^2]) for a given pinger
@@ -123,17 +188,8 @@ def get_squared_error_sum(pinger_pos, is_polar, *hydrophone_tdoas):
                                 (specifically t1-t0)
     @return                     The sum of square of the error calculated for each hydrophone
                                 with the given pinger position
-    '''
-    expected_delta_t_vals = [
-        localization_utils.tdoa_function_3D(pinger_pos, position, is_polar)
-        for position in global_vars.hydrophone_positions[1:]
-    ]
-
-    r = pinger_pos[0] if is_polar else np.sqrt(pinger_pos[0] ** 2 + pinger_pos[1] ** 2)
 
-    squared_error_sum = sum([
-        (actual_delta_t - expected_delta_t) ** 2 + 1e6 * np.heaviside(r - 50, 0.5)
-        for (actual_delta_t, expected_delta_t) in zip(hydrophone_tdoas, expected_delta_t_vals)
-    ])
-
-    return squared_error_sum
+    Solvers should build a localization_utils.TDOAObjective once instead, which reads the
+    depth sensor a single time rather than on every call.
+    '''
+    return localization_utils.TDOAObjective(hydrophone_tdoas, is_polar)(pinger_pos)
@@ -0,0 +1,121 @@
+'''@package tdoa_grid_index
+A precomputed index of the TDOA values expected over a grid of pinger positions, used to pick
+starting points for the iterative position calculation.
+
+'''
+
+from stages.localization import localization_utils
+from scipy.spatial import cKDTree
+import numpy as np
+import hashlib
+import os
+import global_vars
+from sim_utils.common_types import *
+from sim_utils.output_utils import initialize_logger
+
+# create logger object for this module
+logger = initialize_logger(__name__)
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+# a cache directory in the repository, which experiments can pass as cache_dir
+CACHE_DIR = os.path.join(dir_path, "..", "..", "..", "..", "cache")
+
+
+class TDOAGridIndex:
+    '''
+    TDOAGridIndex holds the TDOA values expected at every point of a polar grid of pinger
+    positions, for the current hydrophone array and pinger depth, in a KD-tree. The grid points
+    whose TDOA values are closest to a measurement are good starting points for NLSPositionCalc:
+    they are already near the global minimum, rather than wherever a fixed guess happens to be.
+
+    The ranges are spaced geometrically, since the TDOA values change fastest close to the array.
+    The expected TDOA values only depend on the array, the speed of sound, the grid and the depth
+    (rounded to depth_resolution). They are kept in memory for the lifetime of the index, and if
+    a cache_dir is given, also stored on disk under a hash of these, so they are only computed
+    once per configuration across runs.
+    '''
+
+    def __init__(self, r_range=(1, 50), num_r=50, num_phi=360, depth_resolution=0.1,
+                 cache_dir=None, hydrophone_positions=None):
+        '''
+        @brief class constructor
+
+        @param r_range              smallest and largest range of the grid, in meters
+        @param num_r                number of ranges in the grid
+        @param num_phi              number of angles in the grid, spread over the whole circle
+        @param depth_resolution     depths are rounded to this before looking up their grid
+        @param cache_dir            directory the expected TDOA values are stored in, for
+                                    example CACHE_DIR. Nothing is written to disk if None
+        @param hydrophone_positions defaults to global_vars.hydrophone_positions at lookup time
+        '''
+        self.r_range = tuple(r_range)
+        self.num_r = num_r
+        self.num_phi = num_phi
+        self.depth_resolution = depth_resolution
+        self.cache_dir = cache_dir
+        self.hydrophone_positions = hydrophone_positions
+
+        r, phi = np.meshgrid(np.geomspace(*self.r_range, num_r),
+                             np.linspace(-np.pi, np.pi, num_phi, endpoint=False), indexing='ij')
+        self.grid = np.stack((r.ravel(), phi.ravel()), axis=-1)
+        self.trees = {}
+
+    def seeds(self, hydrophone_tdoas, depth, k=1, is_polar=True):
+        '''
+        @brief  finds the grid positions with the expected TDOA values closest to the measured ones
+
+        @param hydrophone_tdoas     t0 - ti for every hydrophone after hydrophone 0, or an array of
+                                    such sets on the last axis
+        @param depth                the pinger depth
+        @param k                    the number of positions returned for every TDOA set
+        @param is_polar             whether positions are returned as (r, phi) or (x, y)
+        @return                     array of shape (..., 2) if k is 1, otherwise (..., k, 2), with
+                                    the closest position first
+        '''
+        distances, indices = self.get_tree(depth).query(np.asarray(hydrophone_tdoas, dtype=float), k=k)
+        positions = self.grid[indices]
+
+        if is_polar:
+            return positions
+        return positions[..., :1]*np.stack((np.cos(positions[..., 1]), np.sin(positions[..., 1])), axis=-1)
+
+    def get_tree(self, depth):
+        '''
+        @brief  the KD-tree of expected TDOA values for a depth, loaded from the disk cache or
+                computed if this configuration was not seen before
+        '''
+        hydrophone_positions = self.hydrophone_positions
+        if hydrophone_positions is None:
+            hydrophone_positions = global_vars.hydrophone_positions
+        hydrophone_positions = tuple(hydrophone_positions)
+
+        depth = self.depth_resolution*np.round(depth/self.depth_resolution)
+        key = self.cache_key(hydrophone_positions, depth)
+        if key in self.trees:
+            return self.trees[key]
+
+        path = None if self.cache_dir is None else os.path.join(self.cache_dir, "tdoa_grid_%s.npz" % key)
+        if path is not None and os.path.exists(path):
+            with np.load(path) as cached:
+                tdoas = cached["tdoas"]
+        else:
+            objective = localization_utils.TDOAObjective(np.zeros(len(hydrophone_positions) - 1), True,
+                                                         depth, hydrophone_positions)
+            tdoas = objective.expected_tdoas(self.grid)
+            logger.info("Computed expected TDOA values over %d grid positions" % len(self.grid))
+
+            if path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # written under a temporary name so a partly written file is never loaded
+                with open(path + ".tmp", "wb") as cache_file:
+                    np.savez(cache_file, tdoas=tdoas)
+                os.replace(path + ".tmp", path)
+
+        self.trees[key] = cKDTree(tdoas)
+        return self.trees[key]
+
+    def cache_key(self, hydrophone_positions, depth):
+        geometry = localization_utils.hydrophone_array(hydrophone_positions)
+        configuration = repr((float(depth), float(global_vars.speed_of_sound), self.r_range, self.num_r, self.num_phi))
+
+        return hashlib.sha1(geometry.tobytes() + configuration.encode()).hexdigest()[:16]
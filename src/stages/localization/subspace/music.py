@@ -68,9 +68,7 @@ class MUSIC:
             plot_signals(*sim_signal, title="Input to MUSIC Localization Algorithm")        
 
         # take FFT of each signal
-        y_fft = np.array([
-            fft(sig) for sig in sim_signal 
-        ])
+        y_fft = fft(np.asarray(sim_signal), axis=-1)
 
         # get autocorrelation matrix of frequency domain vector
         r_yy = self.get_autocorrelation_matrix(y_fft, is_fft=True)
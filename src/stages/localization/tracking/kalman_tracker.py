@@ -0,0 +1,188 @@
+'''@package kalman_tracker
+The component modelling the tracking of the pinger across pings, to smooth the calculated
+positions and start every position calculation from the predicted position.
+
+'''
+
+import numpy as np
+from scipy.stats import chi2
+import global_vars
+from sim_utils.common_types import *
+from sim_utils.output_utils import initialize_logger
+
+# create logger object for this module
+logger = initialize_logger(__name__)
+
+
+class KalmanTracker:
+    '''
+    KalmanTracker follows the XY position of the pinger, relative to the array, with a constant
+    velocity Kalman filter over the positions calculated from successive pings. It is placed
+    after a position calculation stage (NLSPositionCalc, LinearPositionCalc or
+    MultiStartNLSPositionCalc) and outputs the filtered position in the same type as its input.
+
+    After every ping it writes the position predicted for the next ping to
+    global_vars.initial_guess, in the coordinates of the current initial guess, so the next
+    solve starts next to its solution. The position calculation must read the guess on every
+    apply, for example NLSPositionCalc(guess_at_init=False).
+
+    Pings are assumed to arrive every 1/global_vars.carrier_frequency seconds. When pings can
+    be missed, call set_ping_time before every ping, so the filter predicts over the time that
+    really passed and the initial guess is moved to the prediction for that time.
+
+    The angle of a calculated position is far more reliable than its range, so the measurement
+    noise is modelled in polar coordinates, as angle_sigma radians and range_sigma times the
+    range, and rotated to cartesian coordinates for every measurement. Measurements whose
+    innovation falls outside the gate_probability region of its chi-square distribution are
+    rejected as outliers and the prediction is output instead. After max_misses rejections in a
+    row the track is assumed lost and restarted from the next measurement.
+    '''
+
+    def __init__(self, acceleration_sigma=0.1, angle_sigma=0.02, range_sigma=0.2,
+                 gate_probability=0.999, max_misses=3, initial_speed_sigma=2):
+        '''
+        @brief class constructor
+
+        @param acceleration_sigma   standard deviation of the pinger's acceleration relative to
+                                    the array, in m/s^2
+        @param angle_sigma          standard deviation of the calculated angle, in radians
+        @param range_sigma          standard deviation of the calculated range, as a fraction
+                                    of the range
+        @param gate_probability     probability of a correct measurement passing the gate
+        @param max_misses           number of rejected measurements in a row after which the
+                                    track is restarted
+        @param initial_speed_sigma  standard deviation of the speed of a new track, in m/s
+        '''
+        self.component_name = "KalmanTracker"
+        self.id = "Tracker"
+        self.acceleration_sigma = acceleration_sigma
+        self.angle_sigma = angle_sigma
+        self.range_sigma = range_sigma
+        self.gate = chi2.ppf(gate_probability, df=2)
+        self.max_misses = max_misses
+        self.initial_speed_sigma = initial_speed_sigma
+
+        # observation of the position from the [x, y, vx, vy] state
+        self.observation = np.hstack((np.eye(2), np.zeros((2, 2))))
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.covariance = None
+        # time of the ping the state was last updated for, and of the next ping if it was set
+        self.time = None
+        self.ping_time = None
+        self.misses = 0
+        self.diagnostics = {}
+
+    def set_ping_time(self, time):
+        '''
+        @brief sets the time of the next ping, and predicts the initial guess for it
+
+        @param time     time of the next ping, in seconds, on the same clock for every ping
+        '''
+        self.ping_time = time
+        if self.state is not None:
+            self.set_initial_guess(time - self.time)
+
+    def apply(self, sim_signal):
+        '''
+        @brief Applies the simulation signal to the component and returns its outputs.
+
+        @param sim_signal   the CylindricalPosition or CartesianPosition calculated for this ping
+        '''
+        is_polar = type(sim_signal) == CylindricalPosition
+        measurement_cart = cyl_to_cart(sim_signal) if is_polar else sim_signal
+        measurement = np.array([measurement_cart.x, measurement_cart.y])
+        measurement_covariance = self.measurement_covariance(measurement)
+
+        period = 1/global_vars.carrier_frequency
+        ping_time = self.ping_time
+        if ping_time is None:
+            ping_time = 0.0 if self.time is None else self.time + period
+
+        if self.state is None or self.misses >= self.max_misses:
+            self.start_track(measurement, measurement_covariance)
+            accepted = True
+            distance = 0.0
+        else:
+            self.predict(ping_time - self.time)
+            accepted, distance = self.update(measurement, measurement_covariance)
+        self.time = ping_time
+        self.ping_time = None
+
+        self.misses = 0 if accepted else self.misses + 1
+        self.diagnostics = {"measurement": sim_signal, "accepted": accepted, "innovation_distance": distance}
+        if not accepted:
+            logger.info("Rejected calculated position %s, %.1f from the predicted position"
+                        % (str(sim_signal), distance))
+
+        self.set_initial_guess(period)
+
+        position = CartesianPosition(self.state[0], self.state[1], measurement_cart.z)
+        return cart_to_cyl(position) if is_polar else position
+
+    def start_track(self, measurement, measurement_covariance):
+        self.state = np.concatenate((measurement, np.zeros(2)))
+        self.covariance = np.zeros((4, 4))
+        self.covariance[:2, :2] = measurement_covariance
+        self.covariance[2:, 2:] = self.initial_speed_sigma**2*np.eye(2)
+
+    def predict(self, dt):
+        transition = self.transition(dt)
+        self.state = transition @ self.state
+        self.covariance = transition @ self.covariance @ transition.T + self.process_covariance(dt)
+
+    def update(self, measurement, measurement_covariance):
+        '''
+        @return whether the measurement passed the gate, and its Mahalanobis distance from the
+                predicted position
+        '''
+        innovation = measurement - self.observation @ self.state
+        innovation_covariance = self.observation @ self.covariance @ self.observation.T + measurement_covariance
+        distance_2 = innovation @ np.linalg.solve(innovation_covariance, innovation)
+
+        if distance_2 > self.gate:
+            return False, float(np.sqrt(distance_2))
+
+        gain = np.linalg.solve(innovation_covariance, self.observation @ self.covariance).T
+        self.state = self.state + gain @ innovation
+        # Joseph form, which keeps the covariance symmetric and positive definite
+        correction = np.eye(4) - gain @ self.observation
+        self.covariance = correction @ self.covariance @ correction.T + gain @ measurement_covariance @ gain.T
+
+        return True, float(np.sqrt(distance_2))
+
+    def set_initial_guess(self, dt):
+        predicted = self.transition(dt) @ self.state
+
+        if type(global_vars.initial_guess) == Cartesian2DPosition:
+            global_vars.initial_guess = Cartesian2DPosition(predicted[0], predicted[1])
+        else:
+            global_vars.initial_guess = cart2d_to_polar(Cartesian2DPosition(predicted[0], predicted[1]))
+
+    def measurement_covariance(self, measurement):
+        '''
+        @return the covariance of a calculated XY position, from its polar uncertainties
+        '''
+        r = np.hypot(*measurement)
+        # columns along and across the line of sight
+        rotation = np.array([[measurement[0], -measurement[1]],
+                             [measurement[1], measurement[0]]])/max(r, np.finfo(float).eps)
+        polar_variances = np.diag([(self.range_sigma*r)**2, (self.angle_sigma*r)**2])
+
+        return rotation @ polar_variances @ rotation.T
+
+    def transition(self, dt):
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+        return transition
+
+    def process_covariance(self, dt):
+        # white noise acceleration
+        block = self.acceleration_sigma**2*np.array([[dt**4/4, dt**3/2],
+                                                     [dt**3/2, dt**2]])
+        return np.kron(block, np.eye(2))
+
+    def write_frame(self, frame):
+        return self.diagnostics
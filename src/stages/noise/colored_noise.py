@@ -0,0 +1,179 @@
+import global_vars
+import numpy as np
+from scipy import fft
+from functools import lru_cache
+from sim_utils.common_types import SignalSegment
+
+# power spectral density slopes, in dB per decade of frequency
+SPECTRUM_SLOPES = {
+    "white": 0,
+    "pink": -10,
+    "brown": -20,
+    "blue": 10,
+    "violet": 20,
+    # Knudsen curves for wind driven ambient sea noise, about -5 dB per octave
+    "knudsen": -17,
+}
+
+
+class ColoredNoise:
+    '''
+    adds zero mean gaussian noise with a shaped power spectrum
+
+    White noise for every channel is drawn in one call and shaped with a single
+    batched FFT. The spectrum is either one of the names in SPECTRUM_SLOPES or a
+    sequence of (frequency in Hz, power in dB) breakpoints, interpolated on a log
+    frequency axis and held constant outside of the first and last breakpoint.
+    The noise is scaled to a standard deviation of sigma on every channel.
+
+    With correlation set, the channels are mixed so that the noise of any two
+    channels has that correlation coefficient. It can be a single coefficient
+    for all channel pairs or a full (n_channels, n_channels) correlation matrix.
+
+    The noise is drawn from self.rng, which the simulation chain replaces with a
+    fresh stream on every iteration (see sim_utils.rng)
+    '''
+    # the output is always a fresh array (or an owned input), which the next stage may modify
+    owns_output = True
+
+    def __init__(self, sigma, spectrum="pink", correlation=None, sampling_frequency=None, dtype=None):
+        self.sigma = sigma
+        # hashable, so the shaping filter can be cached
+        self.spectrum = spectrum if isinstance(spectrum, str) else tuple(map(tuple, spectrum))
+        self.correlation = correlation
+        # None means the input is sampled at global_vars.continuous_sampling_frequency, or at
+        # the rate of the stage before it in a chain
+        self.sampling_frequency = sampling_frequency
+        # floating point type of the noise. None uses global_vars.analog_dtype
+        self.dtype = dtype
+        self.rng = np.random.default_rng()
+        self.input_owned = False
+
+    def set_input_sampling_frequency(self, sampling_frequency):
+        '''
+        sets the rate of the input, as generated upstream. Raises if a different rate was
+        given to the constructor
+        '''
+        if self.sampling_frequency is not None and self.sampling_frequency != sampling_frequency:
+            raise ValueError("%s was given a sampling_frequency of %s, but its input is sampled at %s"
+                             % (type(self).__name__, self.sampling_frequency, sampling_frequency))
+
+        self.sampling_frequency = sampling_frequency
+
+    def set_rng(self, rng):
+        self.rng = rng
+
+    def set_input_owned(self, input_owned):
+        # set by the chain when the previous stage hands over an array nothing else refers to
+        self.input_owned = input_owned
+
+    def apply(self, sim_signal):
+        # only the samples inside a segment are noised
+        if isinstance(sim_signal, SignalSegment):
+            return sim_signal._replace(data=self.apply(sim_signal.data))
+
+        sim_signal = np.asarray(sim_signal)
+        noise = self.draw_noise(sim_signal.shape)
+
+        # never write into a shared (read-only) signal, such as a cached clean signal
+        if self.input_owned and sim_signal.flags.writeable and \
+                np.can_cast(noise.dtype, sim_signal.dtype, casting='same_kind'):
+            sim_signal += noise
+            return sim_signal
+
+        return np.add(sim_signal, noise, dtype=noise.dtype)
+
+    def draw_noise(self, shape):
+        '''
+        draws shaped noise for every channel at once
+        '''
+        dtype = global_vars.analog_dtype if self.dtype is None else self.dtype
+        num_samples = shape[-1]
+        # the FFT is much faster on lengths with small prime factors. The extra
+        # samples are dropped, which doesn't change the statistics of the noise
+        fft_size = fft.next_fast_len(num_samples, real=True)
+
+        white = self.rng.standard_normal(shape[:-1] + (fft_size,), dtype=dtype)
+        if self.correlation is not None and len(shape) > 1:
+            white = np.matmul(channel_mixing(self.correlation, shape[-2]).astype(dtype), white)
+
+        spectrum = fft.rfft(white, axis=-1)
+        spectrum *= shaping_filter(self.spectrum, self.get_sampling_frequency(), fft_size).astype(dtype)
+        noise = fft.irfft(spectrum, fft_size, axis=-1)[..., :num_samples]
+
+        noise *= self.sigma
+        return noise
+
+    def get_sampling_frequency(self):
+        if self.sampling_frequency is None:
+            return global_vars.continuous_sampling_frequency
+        return self.sampling_frequency
+
+    def write_frame(self, frame):
+        pass
+
+
+@lru_cache(maxsize=32)
+def shaping_filter(spectrum, sampling_frequency, fft_size):
+    '''
+    The amplitude response applied to the rfft of white noise, normalized so that
+    the shaped noise has unit variance.
+
+    @param spectrum     name of a spectrum in SPECTRUM_SLOPES or a tuple of
+                        (frequency, power in dB) breakpoints
+    @return             read-only array of fft_size//2 + 1 amplitudes
+    '''
+    freqs = fft.rfftfreq(fft_size, 1/sampling_frequency)
+    # the DC bin is left out, the noise is zero mean
+    log_freqs = np.log10(freqs[1:])
+
+    if isinstance(spectrum, str):
+        if spectrum not in SPECTRUM_SLOPES:
+            raise ValueError("Unknown noise spectrum %s. Expected one of %s or a list of "
+                             "(frequency, dB) breakpoints" % (spectrum, list(SPECTRUM_SLOPES)))
+        power_db = SPECTRUM_SLOPES[spectrum] * log_freqs
+    else:
+        breakpoints = np.array(sorted(spectrum), dtype=float)
+        power_db = np.interp(log_freqs, np.log10(breakpoints[:, 0]), breakpoints[:, 1])
+
+    # relative to the peak, to keep the power terms in range
+    amplitude = np.zeros(len(freqs))
+    amplitude[1:] = 10**((power_db - power_db.max()) / 20)
+
+    # every bin but DC and Nyquist stands for a positive and a negative frequency
+    weights = np.full(len(freqs), 2.0)
+    weights[0] = 1
+    if fft_size % 2 == 0:
+        weights[-1] = 1
+    amplitude /= np.sqrt(np.sum(weights * amplitude**2) / fft_size)
+
+    amplitude.setflags(write=False)
+    return amplitude
+
+
+@lru_cache(maxsize=32)
+def _uniform_mixing(correlation, num_channels):
+    return _cholesky(np.full((num_channels, num_channels), correlation) +
+                     (1 - correlation) * np.eye(num_channels))
+
+
+def channel_mixing(correlation, num_channels):
+    '''
+    The matrix that gives independent unit variance channels the requested correlation
+
+    @param correlation  a correlation coefficient shared by every channel pair or a
+                        (num_channels, num_channels) correlation matrix
+    '''
+    if np.isscalar(correlation):
+        return _uniform_mixing(correlation, num_channels)
+
+    correlation = np.asarray(correlation)
+    if correlation.shape != (num_channels, num_channels):
+        raise ValueError("Noise correlation matrix must be %d x %d" % (num_channels, num_channels))
+    return _cholesky(correlation)
+
+
+def _cholesky(correlation):
+    mixing = np.linalg.cholesky(correlation)
+    mixing.setflags(write=False)
+    return mixing
@@ -1,22 +1,73 @@
 import global_vars
 import numpy as np
+from sim_utils.common_types import SignalSegment
 
 
 class GaussianNoise:
     '''
     adds gaussian noise at the configured mean and standard deviation
+
+    The noise is drawn from self.rng, which the simulation chain replaces with a
+    fresh stream on every iteration (see sim_utils.rng)
+
+    Noise for all channels is drawn in one call into a buffer that is reused
+    between iterations. If the chain reports that the input is owned by this
+    stage (see set_input_owned), the noise is added to the input in place and
+    no new signal array is allocated.
     '''
-    def __init__(self, mu, sigma):
+    # the output is always a fresh array (or an owned input), which the next stage may modify
+    owns_output = True
+
+    def __init__(self, mu, sigma, dtype=None):
         self.mu = mu
         self.sigma = sigma
+        # floating point type of the noise. None uses global_vars.analog_dtype
+        self.dtype = dtype
+        self.rng = np.random.default_rng()
+        self.input_owned = False
+        self.noise = None
+
+    def set_rng(self, rng):
+        self.rng = rng
+
+    def set_input_owned(self, input_owned):
+        # set by the chain when the previous stage hands over an array nothing else refers to
+        self.input_owned = input_owned
 
     def apply(self, sim_signal):
-        noisy_sigs = tuple(
-            sig + np.random.normal(self.mu, self.sigma, sig.shape)
-            for sig in sim_signal
-        )
+        # only the samples inside a segment are noised
+        if isinstance(sim_signal, SignalSegment):
+            return sim_signal._replace(data=self.apply(sim_signal.data))
+
+        sim_signal = np.asarray(sim_signal)
+        noise = self.draw_noise(sim_signal.shape)
+
+        # never write into a shared (read-only) signal, such as a cached clean signal
+        if self.input_owned and sim_signal.flags.writeable and \
+                np.can_cast(noise.dtype, sim_signal.dtype, casting='same_kind'):
+            sim_signal += noise
+            return sim_signal
+
+        return np.add(sim_signal, noise, dtype=noise.dtype)
+
+    def draw_noise(self, shape):
+        '''
+        draws noise for every channel at once into the reusable noise buffer
+        '''
+        dtype = global_vars.analog_dtype if self.dtype is None else self.dtype
+        if self.noise is None or self.noise.shape != shape or self.noise.dtype != dtype:
+            self.noise = np.empty(shape, dtype=dtype)
+
+        self.rng.standard_normal(out=self.noise, dtype=dtype)
+        self.noise *= self.sigma
+        if self.mu:
+            self.noise += self.mu
+
+        return self.noise
 
-        return noisy_sigs
+    def stream(self, blocks, block_size):
+        for block in blocks:
+            yield self.apply(block)
 
     def write_frame(self, frame):
-        pass
\ No newline at end of file
+        pass
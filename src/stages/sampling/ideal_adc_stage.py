@@ -1,5 +1,6 @@
-from components.sampling.ideal_adc import IdealADC
+from components.sampling.ideal_adc import IdealADC, decimation_indices
 import global_vars
+from sim_utils.common_types import SignalSegment
 import numpy as np
 from sim_utils.output_utils import initialize_logger
 import logging
@@ -10,31 +11,87 @@ class IdealADCStage:
     stage to simulate an ADC for every hydrophone signal channel
     '''
 
-    def __init__(self, num_bits, quantization_method):
+    def __init__(self, num_bits, quantization_method, input_sampling_frequency=None, full_scale=None):
         # create logger object for this module
         self.logger = initialize_logger(__name__)
         self.num_bits = num_bits
         self.quantization_method = quantization_method
+        # None means the input is sampled at global_vars.continuous_sampling_frequency, or at
+        # the rate of the InputGenerationStage before it in a chain
+        self.input_sampling_frequency = input_sampling_frequency
+        # (min, max) analog input range. Required when streaming, since a block
+        # cannot be scaled to the min and max of the whole signal
+        self.full_scale = full_scale
 
-        # as many channels as there are hydrophones
-        self.num_components = len(global_vars.hydrophone_positions)
+        # a single ADC model samples every hydrophone channel at once
+        self.component = IdealADC(num_bits, quantization_method, input_sampling_frequency, full_scale)
 
-        # Create IdealADCs
-        self.components = []
-        for i in range(self.num_components):
-            self.components.append(
-                IdealADC(num_bits, quantization_method)
-            )
+    @property
+    def output_sampling_frequency(self):
+        return global_vars.sampling_frequency
+
+    def set_input_sampling_frequency(self, sampling_frequency):
+        '''
+        sets the rate of the input, as generated upstream. Raises if a different rate was
+        given to the constructor
+        '''
+        if self.input_sampling_frequency is not None and self.input_sampling_frequency != sampling_frequency:
+            raise ValueError("%s was given an input_sampling_frequency of %s, but its input is sampled at %s"
+                             % (type(self).__name__, self.input_sampling_frequency, sampling_frequency))
+
+        self.input_sampling_frequency = sampling_frequency
+        self.component.input_sampling_frequency = sampling_frequency
 
     def apply(self, sim_signal):
+        if isinstance(sim_signal, SignalSegment):
+            return self.apply_segment(sim_signal)
+
         level = self.logger.getEffectiveLevel()
         if level <= logging.DEBUG:
             plot_signals(*sim_signal, title="Input to ADC")        
 
-        return tuple(
-            np.array(component.apply(sig))
-            for (component, sig) in zip(self.components, sim_signal)
+        # every channel is quantized over its own range
+        return self.component.apply(np.asarray(sim_signal))
+
+    def apply_segment(self, segment):
+        '''
+        samples and quantizes only the samples inside the segment. The samples kept
+        are the ones the full-length downsample would keep in the same range, and the
+        output segment is indexed at the ADC sampling rate
+
+        Without a full_scale, each channel is quantized over the range of the segment
+        rather than of the whole measurement. The two agree without noise, but noise
+        outside the segment would widen the range of the full-length signal, so set
+        full_scale for levels that match the dense path exactly
+        '''
+        fs_old = self.component.get_input_sampling_frequency()
+        start_index, old_indices = decimation_indices(
+            segment.start_index,
+            segment.start_index + segment.data.shape[-1],
+            fs_old,
+            global_vars.sampling_frequency,
+            segment.num_samples
         )
+        sampled_signal = segment.data[:, old_indices - segment.start_index]
+
+        num_samples = int(round(segment.num_samples * global_vars.sampling_frequency / fs_old))
+
+        return SignalSegment(
+            self.component.digitize(sampled_signal),
+            start_index,
+            num_samples
+        )
+
+    def stream(self, blocks, block_size):
+        '''
+        samples and quantizes a stream of SignalSegment blocks. Each block carries its
+        start index, so the decimation phase carries over from one block to the next
+        '''
+        if self.full_scale is None:
+            raise ValueError("IdealADCStage needs a full_scale input range to run on a stream")
+
+        for block in blocks:
+            yield self.apply_segment(block)
 
     def write_frame(self, frame):
         pass
\ No newline at end of file
@@ -0,0 +1,104 @@
+from components.sampling.ideal_adc import IdealADC
+from components.sampling.polyphase_resampler import PolyphaseResampler
+import global_vars
+from sim_utils.common_types import SignalSegment
+import numpy as np
+from sim_utils.output_utils import initialize_logger
+import logging
+from sim_utils.plt_utils import plot_signals
+
+class PolyphaseADCStage:
+    '''
+    stage to simulate an ADC with an anti-aliasing filter for every hydrophone signal channel
+
+    Unlike IdealADCStage, the input is resampled to global_vars.sampling_frequency with
+    a polyphase low-pass filter instead of picking the nearest sample. Noise above the
+    ADC Nyquist frequency is filtered out rather than aliased, and the ratio between the
+    input and ADC rates does not need to be an integer, so the input can be generated
+    at only a few times the signal frequency.
+    '''
+
+    def __init__(self, num_bits, quantization_method, input_sampling_frequency=None, full_scale=None,
+                 filter_half_width=10):
+        # create logger object for this module
+        self.logger = initialize_logger(__name__)
+        self.num_bits = num_bits
+        self.quantization_method = quantization_method
+        # None means the input is sampled at global_vars.continuous_sampling_frequency, or at
+        # the rate of the InputGenerationStage before it in a chain
+        self.input_sampling_frequency = input_sampling_frequency
+        # (min, max) analog input range. Required when streaming, since a block
+        # cannot be scaled to the min and max of the whole signal
+        self.full_scale = full_scale
+        # anti-aliasing filter length, see PolyphaseResampler
+        self.filter_half_width = filter_half_width
+
+        # a single ADC model quantizes every hydrophone channel at once
+        self.component = IdealADC(num_bits, quantization_method, input_sampling_frequency, full_scale)
+
+    def get_resampler(self):
+        # filter taps are cached per rate pair, so this is cheap
+        return PolyphaseResampler(
+            self.component.get_input_sampling_frequency(),
+            global_vars.sampling_frequency,
+            self.filter_half_width
+        )
+
+    @property
+    def output_sampling_frequency(self):
+        return global_vars.sampling_frequency
+
+    def set_input_sampling_frequency(self, sampling_frequency):
+        '''
+        sets the rate of the input, as generated upstream. Raises if a different rate was
+        given to the constructor
+        '''
+        if self.input_sampling_frequency is not None and self.input_sampling_frequency != sampling_frequency:
+            raise ValueError("%s was given an input_sampling_frequency of %s, but its input is sampled at %s"
+                             % (type(self).__name__, self.input_sampling_frequency, sampling_frequency))
+
+        self.input_sampling_frequency = sampling_frequency
+        self.component.input_sampling_frequency = sampling_frequency
+
+    def apply(self, sim_signal):
+        if isinstance(sim_signal, SignalSegment):
+            return self.apply_segment(sim_signal)
+
+        level = self.logger.getEffectiveLevel()
+        if level <= logging.DEBUG:
+            plot_signals(*sim_signal, title="Input to ADC")
+
+        resampled_signal = self.get_resampler().apply(sim_signal)
+        return self.component.digitize(resampled_signal)
+
+    def apply_segment(self, segment):
+        '''
+        resamples and quantizes the segment, treating the samples outside of it as
+        zero. The output segment covers every ADC sample the segment contributes to
+        and is indexed at the ADC sampling rate
+        '''
+        resampler = self.get_resampler()
+        resampled = list(resampler.stream([segment]))
+
+        if not resampled:
+            # the segment is past the end of the resampled signal
+            num_samples = resampler.output_length(segment.num_samples)
+            return SignalSegment(self.component.digitize(segment.data[..., :0]), num_samples, num_samples)
+
+        # a single input block resamples into a single output block
+        return resampled[0]._replace(data=self.component.digitize(resampled[0].data))
+
+    def stream(self, blocks, block_size):
+        '''
+        resamples and quantizes a stream of SignalSegment blocks. The filter state
+        carries over from one block to the next, so the output matches the
+        full-length signal
+        '''
+        if self.full_scale is None:
+            raise ValueError("PolyphaseADCStage needs a full_scale input range to run on a stream")
+
+        for block in self.get_resampler().stream(blocks):
+            yield block._replace(data=self.component.digitize(block.data))
+
+    def write_frame(self, frame):
+        pass
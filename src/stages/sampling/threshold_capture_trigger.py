@@ -1,5 +1,15 @@
 import global_vars
+import numpy as np
 from components.sampling.threshold_index_finder import ThresholdIndexFinder
+from sim_utils.common_types import SignalSegment
+from sim_utils.output_utils import initialize_logger
+
+
+class PingNotDetectedError(Exception):
+    '''
+    raised when no channel of the signal crosses the capture threshold
+    '''
+    pass
 
 
 class ThresholdCaptureTrigger:
@@ -9,37 +19,111 @@ class ThresholdCaptureTrigger:
     -2^(num_bits-1) and 2^(num_bits-1)).
 
     This emulates the fact that our system can only grab a portion of the signal.
+    The captured window starts pre_trigger_samples before the trigger and holds
+    num_samples samples from the trigger onwards. The captured window is a view
+    into the input signal, not a copy.
+
+    The threshold can be a single value or one value per hydrophone. If no
+    channel crosses it, PingNotDetectedError is raised.
     '''
 
-    def __init__(self, num_samples, threshold):
+    def __init__(self, num_samples, threshold, pre_trigger_samples=0, chunk_size=None):
+        # create logger object for this module
+        self.logger = initialize_logger(__name__)
         self.num_samples = num_samples
-        self.threshold = num_samples
-
-        # instantiate a threshold time finder for each component
-        self.num_components = len(global_vars.hydrophone_positions)
+        self.threshold = threshold
+        self.pre_trigger_samples = pre_trigger_samples
 
-        # Create ThresholdIndexFinder
-        self.components = []
-        for i in range(self.num_components):
-            self.components.append(
-                ThresholdIndexFinder(num_samples, threshold)
-            )
+        # a single threshold finder searches every hydrophone channel at once.
+        # chunk_size stops the search early on long signals, see ThresholdIndexFinder
+        self.component = ThresholdIndexFinder(num_samples, threshold, chunk_size)
 
     def apply(self, sim_signal):
-        # find the point at which the signals cross the treshold
-        trigger_indices = [
-            component.apply(signal)
-            for component, signal in zip(self.components, sim_signal)
-        ]
+        if isinstance(sim_signal, SignalSegment):
+            return self.apply_segment(sim_signal)
 
-        # trigger based on the first signal that crosses the threshold
-        trigger_index = min(trigger_indices)
+        sim_signal = np.asarray(sim_signal)
+
+        trigger_index = self.find_trigger_index(sim_signal)
+        if trigger_index is None:
+            raise PingNotDetectedError("No hydrophone signal crossed the capture threshold")
+
+        window_start = max(trigger_index - self.pre_trigger_samples, 0)
 
         # capture a window after the trigger as the analyzed signal
-        return tuple(
-            signal[trigger_index:(trigger_index + self.num_samples)]
-            for signal in sim_signal
-        )
+        return sim_signal[:, window_start:(trigger_index + self.num_samples)]
+
+    def apply_segment(self, segment):
+        '''
+        captures the window from a SignalSegment. The captured window is the one the
+        full-length signal would give, so the segment must hold all of it. Raises a
+        ValueError if the window runs past either end of the segment
+        '''
+        data = np.asarray(segment.data)
+        trigger_index = self.find_trigger_index(data)
+        if trigger_index is None:
+            raise PingNotDetectedError("No hydrophone signal crossed the capture threshold")
+
+        # window bounds in the full-length signal
+        trigger_index += segment.start_index
+        window_start = max(trigger_index - self.pre_trigger_samples, 0)
+        window_end = min(trigger_index + self.num_samples, segment.num_samples)
+
+        segment_end = segment.start_index + data.shape[-1]
+        if window_start < segment.start_index or window_end > segment_end:
+            raise ValueError("Capture window [%d, %d) runs past the signal segment [%d, %d). "
+                             "Increase the segment padding to capture %d samples"
+                             % (window_start, window_end, segment.start_index, segment_end, self.num_samples))
+
+        return data[:, (window_start - segment.start_index):(window_end - segment.start_index)]
+
+    def stream(self, blocks, block_size):
+        '''
+        captures the window from a stream of SignalSegment blocks. The last
+        pre_trigger_samples samples are carried over between blocks as the pre-roll.
+        The stream stops pulling blocks as soon as the window is full, so nothing
+        upstream is computed past the end of the capture.
+        '''
+        pre_roll = None
+        captured = []
+        samples_needed = None
+
+        for block in blocks:
+            data = block.data
+
+            if samples_needed is None:
+                trigger_index = self.find_trigger_index(data)
+
+                if trigger_index is None:
+                    # keep the end of the block in case the next one triggers
+                    if self.pre_trigger_samples > 0:
+                        if pre_roll is not None:
+                            data = np.concatenate((pre_roll, data), axis=-1)
+                        pre_roll = data[:, -self.pre_trigger_samples:]
+                    continue
+
+                if pre_roll is not None:
+                    data = np.concatenate((pre_roll, data), axis=-1)
+                    trigger_index += pre_roll.shape[-1]
+
+                data = data[:, max(trigger_index - self.pre_trigger_samples, 0):]
+                samples_needed = min(trigger_index, self.pre_trigger_samples) + self.num_samples
+
+            captured.append(data[:, :samples_needed])
+            samples_needed -= captured[-1].shape[-1]
+
+            if samples_needed <= 0:
+                break
+
+        if samples_needed is None:
+            raise PingNotDetectedError("No hydrophone signal crossed the capture threshold")
+
+        # a window inside a single block is returned as a view of that block
+        yield captured[0] if len(captured) == 1 else np.concatenate(captured, axis=-1)
+
+    def find_trigger_index(self, sim_signal):
+        # trigger based on the first signal that crosses the threshold
+        return self.component.apply(sim_signal)
 
     def write_frame(self, frame):
-        pass
\ No newline at end of file
+        pass
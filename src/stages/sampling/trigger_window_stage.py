@@ -0,0 +1,129 @@
+import global_vars
+import numpy as np
+from components.sampling.threshold_index_finder import ThresholdIndexFinder
+from sim_utils.common_types import SignalSegment
+from sim_utils.output_utils import initialize_logger
+
+
+class TriggerWindowStage:
+    '''
+    cuts the clean hydrophone signals down to the window that ThresholdCaptureTrigger
+    will capture, so that the noise and ADC stages only process that window.
+
+    The trigger threshold is converted to analog units and the window is found on
+    the clean signal. The noisy signal crosses the threshold somewhere between the
+    first sample where the clean signal is within noise_bound standard deviations of
+    the threshold and the first sample where it is noise_bound standard deviations
+    above it. The output SignalSegment covers the capture window for every trigger
+    point in that range, plus padding on either side.
+
+    Goes right after InputGenerationStage. The window depends only on the clean
+    signal, so it is reused as long as the same (cached) clean signal comes in.
+    If the clean signal never clears the threshold by the noise bound, the window
+    cannot be predicted and the signal is passed through whole.
+
+    With noise, the results are not bit-identical to the dense chain, since the
+    noise is only drawn for the window. Without a fixed ADC full_scale, given to
+    this stage as well, they also differ in distribution: the ADC scales every
+    channel to the min and max of the window instead of the whole measurement,
+    and the analog threshold is only estimated from the clean peak plus
+    noise_bound standard deviations (see analog_threshold). Without noise, the
+    captured window is the same.
+    '''
+
+    def __init__(self, num_samples, threshold, num_bits, noise_sigma, pre_trigger_samples=0,
+                 full_scale=None, input_sampling_frequency=None, noise_bound=6, padding=1e-4):
+        # create logger object for this module
+        self.logger = initialize_logger(__name__)
+        # capture trigger and ADC settings, in ADC samples and levels
+        self.num_samples = num_samples
+        self.threshold = threshold
+        self.num_bits = num_bits
+        self.pre_trigger_samples = pre_trigger_samples
+        self.full_scale = full_scale
+        # None means the input is sampled at global_vars.continuous_sampling_frequency, or at
+        # the rate of the InputGenerationStage before it in a chain
+        self.input_sampling_frequency = input_sampling_frequency
+        # standard deviation of the noise added after this stage
+        self.noise_sigma = noise_sigma
+        # number of standard deviations the noise is assumed to stay within
+        self.noise_bound = noise_bound
+        # time kept on either side of the window, in seconds
+        self.padding = padding
+
+        # window computed for the last clean signal
+        self.last_input = None
+        self.last_output = None
+
+    def apply(self, sim_signal):
+        # the clean signal is cached between iterations, and so is the window
+        if sim_signal is self.last_input:
+            return self.last_output
+
+        self.last_output = self.find_window(sim_signal)
+        self.last_input = sim_signal
+
+        return self.last_output
+
+    def find_window(self, sim_signal):
+        if isinstance(sim_signal, SignalSegment):
+            data, offset, num_samples = sim_signal
+        else:
+            data = np.asarray(sim_signal)
+            offset, num_samples = 0, data.shape[-1]
+
+        threshold = self.analog_threshold(data)
+        margin = self.noise_bound * self.noise_sigma
+
+        earliest = ThresholdIndexFinder(self.num_samples, threshold - margin).apply(data)
+        latest = ThresholdIndexFinder(self.num_samples, threshold + margin).apply(data)
+        if earliest is None or latest is None:
+            self.logger.warning("Cannot predict the capture window from the clean signal, "
+                                "passing the full signal through")
+            return sim_signal
+
+        # capture lengths are in ADC samples
+        fs = self.get_input_sampling_frequency()
+        samples_per_adc_sample = fs / global_vars.sampling_frequency
+        padding = int(np.ceil(self.padding * fs))
+
+        start = earliest - int(np.ceil(self.pre_trigger_samples * samples_per_adc_sample)) - padding
+        stop = latest + int(np.ceil(self.num_samples * samples_per_adc_sample)) + padding
+        start, stop = max(start, 0), min(stop, data.shape[-1])
+
+        return SignalSegment(data[..., start:stop], offset + start, num_samples)
+
+    def analog_threshold(self, data):
+        '''
+        the input level that quantizes to the trigger threshold, per channel. Exact with
+        a full_scale, and an estimate otherwise
+        '''
+        half_scale = 2**(self.num_bits-1)
+
+        if self.full_scale is not None:
+            low, high = self.full_scale
+            return low + (self.threshold + half_scale) * (high - low) / (2*half_scale)
+
+        # without a fixed range the ADC spans the min and max of each channel,
+        # roughly the clean peak plus the noise
+        peak = np.abs(data).max(axis=-1) + self.noise_bound * self.noise_sigma
+        return peak * self.threshold / half_scale
+
+    def set_input_sampling_frequency(self, sampling_frequency):
+        '''
+        sets the rate of the input, as generated upstream. Raises if a different rate was
+        given to the constructor
+        '''
+        if self.input_sampling_frequency is not None and self.input_sampling_frequency != sampling_frequency:
+            raise ValueError("%s was given an input_sampling_frequency of %s, but its input is sampled at %s"
+                             % (type(self).__name__, self.input_sampling_frequency, sampling_frequency))
+
+        self.input_sampling_frequency = sampling_frequency
+
+    def get_input_sampling_frequency(self):
+        if self.input_sampling_frequency is None:
+            return global_vars.continuous_sampling_frequency
+        return self.input_sampling_frequency
+
+    def write_frame(self, frame):
+        pass
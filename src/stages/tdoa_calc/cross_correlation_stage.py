@@ -1,5 +1,6 @@
 import global_vars
 from components.tdoa_calc.cross_correlation import CrossCorrelation
+from sim_utils.common_types import distance_3Dpoints
 import numpy as np
 import sim_utils.plt_utils as plt
 import logging
@@ -10,18 +11,35 @@ logger = initialize_logger(__name__)
 
 
 class CrossCorrelationStage:
+    '''
+    finds the time difference of arrival of every hydrophone relative to hydrophone 0
 
-    def __init__(self):
+    lag_bound sets the lags searched for the correlation peak. "period" searches
+    within half a signal period of zero. "baseline" searches every lag the sound
+    can physically take to travel between the two hydrophones, plus one sample.
+
+    interpolation refines the peak position between samples ("parabolic" or
+    "gaussian"), so that the ADC can run at a lower sampling rate.
+    '''
+
+    def __init__(self, lag_bound="period", interpolation=None):
 
         # always using hydrophone 0 as reference
         self.num_components = len(global_vars.hydrophone_positions) - 1
 
+        if lag_bound not in ("period", "baseline"):
+            raise ValueError("lag_bound must be either \"period\" or \"baseline\". You inputted " + str(lag_bound))
+
         # Create CrossCorrelation
         self.components = []
         for i in range(self.num_components):
             identifier = "Cross Correlation Stage" + "[%0d]" % (i + 1)
+            max_lag = None
+            if lag_bound == "baseline":
+                max_lag = baseline_max_lag(global_vars.hydrophone_positions[0],
+                                           global_vars.hydrophone_positions[i + 1])
             self.components.append(
-                CrossCorrelation(identifier=identifier)
+                CrossCorrelation(identifier=identifier, max_lag=max_lag, interpolation=interpolation)
             )
 
     def apply(self, sim_signal):
@@ -44,3 +62,9 @@ class CrossCorrelationStage:
 
     def write_frame(self, frame):
         pass
+
+
+def baseline_max_lag(hydrophone0_pos, hydrophone_pos):
+    # largest lag, in ADC samples, between the signals of two hydrophones
+    travel_time = distance_3Dpoints(hydrophone0_pos, hydrophone_pos) / global_vars.speed_of_sound
+    return int(np.ceil(travel_time * global_vars.sampling_frequency)) + 1
@@ -0,0 +1,70 @@
+import global_vars
+from components.tdoa_calc.gcc_phat import GCCPhat
+from stages.tdoa_calc.cross_correlation_stage import baseline_max_lag
+import numpy as np
+import sim_utils.plt_utils as plt
+import logging
+from sim_utils.output_utils import initialize_logger
+
+# create logger object for this module
+logger = initialize_logger(__name__)
+
+
+class GCCPhatStage:
+    '''
+    finds the time differences of arrival between hydrophones with a batched
+    generalized cross correlation (see GCCPhat)
+
+    With pairs="reference", every hydrophone is paired with hydrophone 0 and the
+    output is a tuple of t0 - ti values, like CrossCorrelationStage. With
+    pairs="all", all M*(M-1)/2 pairs are correlated and the output is an (M, M)
+    matrix holding ti - tj at [i, j]. NLSPositionCalc accepts either.
+
+    lag_bound and interpolation are the same as for CrossCorrelationStage.
+    '''
+
+    def __init__(self, pairs="reference", phat=False, lag_bound="period", interpolation=None):
+        num_hydrophones = len(global_vars.hydrophone_positions)
+        self.pairs = pairs
+
+        if pairs == "reference":
+            pair_list = [(0, i) for i in range(1, num_hydrophones)]
+        elif pairs == "all":
+            pair_list = [(i, j) for i in range(num_hydrophones) for j in range(i + 1, num_hydrophones)]
+        else:
+            raise ValueError("pairs must be either \"reference\" or \"all\". You inputted " + str(pairs))
+
+        if lag_bound not in ("period", "baseline"):
+            raise ValueError("lag_bound must be either \"period\" or \"baseline\". You inputted " + str(lag_bound))
+
+        max_lags = None
+        if lag_bound == "baseline":
+            max_lags = [
+                baseline_max_lag(global_vars.hydrophone_positions[i], global_vars.hydrophone_positions[j])
+                for (i, j) in pair_list
+            ]
+
+        self.component = GCCPhat(pair_list, phat, max_lags, interpolation)
+
+    def apply(self, sim_signal):
+        # plot hydrophone signals if log level in debug mode
+        level = logger.getEffectiveLevel()
+        if level <= logging.DEBUG:
+            plt.plot_signals(*sim_signal, title="Sampled and Quantized Signals")
+
+        tdoa = self.component.apply(sim_signal)
+
+        if self.pairs == "reference":
+            return tuple(tdoa)
+
+        # antisymmetric matrix of every pair
+        num_hydrophones = len(global_vars.hydrophone_positions)
+        tdoa_matrix = np.zeros((num_hydrophones, num_hydrophones))
+        first, second = self.component.pairs.T
+        tdoa_matrix[first, second] = tdoa
+        tdoa_matrix[second, first] = -tdoa
+
+        return tdoa_matrix
+
+    def write_frame(self, frame):
+        pass
@@ -0,0 +1,78 @@
+import global_vars
+from components.tdoa_calc.phase_analysis import get_phases
+from stages.tdoa_calc.cross_correlation_stage import CrossCorrelationStage
+import numpy as np
+import sim_utils.plt_utils as plt
+import logging
+from sim_utils.output_utils import initialize_logger
+
+# create logger object for this module
+logger = initialize_logger(__name__)
+
+
+class HybridTDOAStage:
+    '''
+    finds the time difference of arrival of every hydrophone relative to hydrophone 0
+    by combining a coarse estimate with the phase of the signal frequency.
+
+    The phase difference gives a precise time difference, but only up to a whole
+    number of signal periods. The coarse estimate only has to be within half a
+    period of the truth to pick that number:
+        tdoa = fine + T*round((coarse - fine)/T)
+
+    coarse="onset" uses the first sample of every channel above onset_fraction of
+    the channel's peak, which costs a single pass over the signal. coarse="correlation"
+    uses CrossCorrelationStage with the given lag_bound and interpolation instead.
+
+    The output is a tuple of t0 - ti values, like CrossCorrelationStage.
+    '''
+
+    def __init__(self, coarse="onset", onset_fraction=0.5, lag_bound="baseline", interpolation="parabolic"):
+        if coarse not in ("onset", "correlation"):
+            raise ValueError("coarse must be either \"onset\" or \"correlation\". You inputted " + str(coarse))
+
+        self.coarse = coarse
+        self.onset_fraction = onset_fraction
+        self.correlation_stage = None
+        if coarse == "correlation":
+            self.correlation_stage = CrossCorrelationStage(lag_bound, interpolation)
+
+    def apply(self, sim_signal):
+        # plot hydrophone signals if log level in debug mode
+        level = logger.getEffectiveLevel()
+        if level <= logging.DEBUG:
+            plt.plot_signals(*sim_signal, title="Sampled and Quantized Signals")
+
+        if self.coarse == "onset":
+            coarse_tdoa = onset_tdoas(sim_signal, self.onset_fraction)
+        else:
+            coarse_tdoa = np.array(self.correlation_stage.apply(sim_signal))
+
+        # phase analysis gives ti - t0
+        phases = get_phases(sim_signal)
+        fine_tdoa = (phases[1:] - phases[0]) / (2 * np.pi * global_vars.signal_frequency)
+
+        period = 1 / global_vars.signal_frequency
+        tdoa = fine_tdoa + period * np.round((coarse_tdoa - fine_tdoa) / period)
+
+        return tuple(tdoa)
+
+    def write_frame(self, frame):
+        pass
+
+
+def onset_tdoas(sim_signal, fraction):
+    '''
+    @brief  estimates t0 - ti for every hydrophone from the first sample at which the
+            rectified signal of each channel rises above a fraction of its peak
+
+    @return numpy array with the M-1 time differences in seconds
+    '''
+    sim_signal = np.asarray(sim_signal, dtype=global_vars.analog_dtype)
+    rectified = np.abs(sim_signal - sim_signal.mean(axis=-1, keepdims=True))
+    threshold = fraction * rectified.max(axis=-1, keepdims=True)
+
+    # the first sample above the threshold. Every channel has one, its peak
+    onsets = np.argmax(rectified >= threshold, axis=-1)
+
+    return (onsets[0] - onsets[1:]) / global_vars.sampling_frequency
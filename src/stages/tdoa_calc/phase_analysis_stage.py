@@ -1,5 +1,5 @@
 import global_vars
-from components.tdoa_calc.phase_analysis import PhaseAnalysis
+from components.tdoa_calc.phase_analysis import get_phases
 import numpy as np
 from sim_utils import plt_utils as plt
 import logging
@@ -10,18 +10,11 @@ logger = initialize_logger(__name__)
 
 
 class PhaseAnalysisStage:
-
-    def __init__(self):
-
-        # always using hydrophone 0 as reference
-        self.num_components = len(global_vars.hydrophone_positions) - 1
-
-        self.components = []
-        for i in range(self.num_components):
-            identifier = "Phase Analysis" + "[%0d]" % (i + 1)
-            self.components.append(
-                PhaseAnalysis(identifier=identifier)
-            )
+    '''
+    finds the time difference of arrival of every hydrophone relative to hydrophone 0
+    from the phase of the signal frequency. The phases of all channels are computed in
+    a single product, so the reference phase is only computed once
+    '''
 
     def apply(self, sim_signal):
         # plot hydrophone signals if log level in debug mode
@@ -29,17 +22,12 @@ class PhaseAnalysisStage:
         if level <= logging.DEBUG:
             plt.plot_signals(*sim_signal, title="Sampled and Quantized Signals")
 
-        phase_analysis_inputs = [
-            (sim_signal[0], sim_signal[i+1])
-            for i in range(self.num_components)
-        ]
+        phases = get_phases(sim_signal)
 
-        tdoa = tuple(
-            component.apply(input_sig)
-            for (component, input_sig) in zip(self.components, phase_analysis_inputs)
-        )
+        # always using hydrophone 0 as reference
+        tdoa = (phases[0] - phases[1:]) / (2 * np.pi * global_vars.signal_frequency)
 
-        return tdoa
+        return tuple(tdoa)
 
     def write_frame(self, frame):
         pass
@@ -0,0 +1,5 @@
+import tempfile
+from sim_utils import output_utils
+
+# the tests log outside of the repository
+output_utils.configure_logger("WARNING", "test", directory=tempfile.mkdtemp(prefix="sim_test_log_"))
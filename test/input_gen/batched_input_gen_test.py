@@ -0,0 +1,89 @@
+import numpy as np
+import global_vars
+from sim_utils import input_generation
+from sim_utils.common_types import CylindricalPosition
+from sim_utils.input_generation import (generate_hydrophone_signals, generate_ping_segment, propagation_delays,
+                                        cached_hydrophone_signals, clear_signal_cache)
+
+global_vars.pinger_position = CylindricalPosition(10, 0, 10)
+measurement_period = 20e-3
+duty_cycle = 0.5
+
+
+def test_batched_signals_have_one_row_per_hydrophone():
+    signals = generate_hydrophone_signals(global_vars.hydrophone_positions, measurement_period, duty_cycle)
+    expected_length = int(measurement_period * global_vars.continuous_sampling_frequency)
+
+    assert signals.shape == (len(global_vars.hydrophone_positions), expected_length)
+
+
+def test_batched_signals_start_when_wavefront_arrives():
+    signals = generate_hydrophone_signals(global_vars.hydrophone_positions, measurement_period, duty_cycle)
+    delays = propagation_delays(global_vars.hydrophone_positions)
+    expected_onsets = np.ceil(delays * global_vars.continuous_sampling_frequency)
+
+    onsets = np.argmax(signals != 0, axis=1)
+
+    assert np.all(np.abs(onsets - expected_onsets) <= 1)
+
+
+def test_chunked_generation_matches_a_single_chunk(monkeypatch):
+    for at_adc_rate in (False, True):
+        whole = generate_hydrophone_signals(global_vars.hydrophone_positions, measurement_period, duty_cycle,
+                                            at_adc_rate)
+        # chunk edges that do not divide the signal length
+        monkeypatch.setattr(input_generation, "GENERATION_CHUNK_SIZE", 1000 - 7)
+        chunked = generate_hydrophone_signals(global_vars.hydrophone_positions, measurement_period, duty_cycle,
+                                              at_adc_rate)
+        monkeypatch.undo()
+
+        assert np.array_equal(chunked, whole)
+
+
+def test_ping_segment_matches_dense_signals():
+    signals = generate_hydrophone_signals(global_vars.hydrophone_positions, measurement_period, duty_cycle)
+    segment = generate_ping_segment(global_vars.hydrophone_positions, measurement_period, duty_cycle, 1e-3)
+    stop_index = segment.start_index + segment.data.shape[-1]
+
+    assert segment.num_samples == signals.shape[-1]
+    assert np.allclose(segment.data, signals[:, segment.start_index:stop_index])
+    # everything outside of the segment is silent
+    assert not np.any(signals[:, :segment.start_index])
+
+
+def test_empty_measurements_and_segments():
+    num_hydrophones = len(global_vars.hydrophone_positions)
+    assert generate_hydrophone_signals(global_vars.hydrophone_positions, 0, duty_cycle).shape == (num_hydrophones, 0)
+
+    # the measurement ends before the ping reaches any hydrophone
+    segment = generate_ping_segment(global_vars.hydrophone_positions, 1e-3, duty_cycle, padding=1e-4)
+    assert segment.data.shape == (num_hydrophones, 0)
+
+
+def test_adc_rate_signals_keep_sub_sample_delays():
+    signals = generate_hydrophone_signals(global_vars.hydrophone_positions, measurement_period,
+                                          duty_cycle, at_adc_rate=True)
+    delays = propagation_delays(global_vars.hydrophone_positions)
+    t = np.arange(signals.shape[-1]) / global_vars.sampling_frequency
+
+    assert signals.shape[-1] == int(measurement_period * global_vars.sampling_frequency)
+    # away from the carrier edges the samples are the exactly delayed sine wave
+    steady = t - max(delays) > 1e-3
+    expected = np.sin(2 * np.pi * global_vars.signal_frequency * (t[steady] - delays[:, np.newaxis]))
+    assert np.allclose(signals[:, steady], expected)
+
+
+def test_cached_signals_are_reused_until_geometry_changes():
+    clear_signal_cache()
+    signals = cached_hydrophone_signals(measurement_period, duty_cycle)
+
+    assert cached_hydrophone_signals(measurement_period, duty_cycle) is signals
+    assert not signals.flags.writeable
+
+    global_vars.pinger_position = CylindricalPosition(10, np.pi / 4, 10)
+    moved_signals = cached_hydrophone_signals(measurement_period, duty_cycle)
+    expected = generate_hydrophone_signals(global_vars.hydrophone_positions, measurement_period, duty_cycle)
+    global_vars.pinger_position = CylindricalPosition(10, 0, 10)
+
+    assert moved_signals is not signals
+    assert np.array_equal(moved_signals, expected)
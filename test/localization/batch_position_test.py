@@ -0,0 +1,49 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from sim_utils.common_types import CylindricalPosition, PolarPosition, Cartesian2DPosition, OptimizationType
+from stages.localization.localization_utils import tdoa_function_3D, batch_newton_gauss
+from stages.localization.multilateration.nls import NLSPositionCalc, batch_position_calc
+
+
+def test_batch_matches_single_solves(monkeypatch):
+    monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(15, 2.5, 5))
+    true_tdoa = np.array([tdoa_function_3D(np.array([15, 2.5]), position, True)
+                          for position in global_vars.hydrophone_positions[1:]])
+    tdoas = true_tdoa + np.random.normal(0, 0.05e-6, (20, len(true_tdoa)))
+    depths = 5 + np.random.uniform(0, 2e-3, 20)
+
+    for guess in (PolarPosition(10, 0), Cartesian2DPosition(-8, 2)):
+        positions, converged = batch_position_calc(tdoas, guess, depths)
+        assert positions.shape == (20, 2)
+        assert converged.all()
+
+        monkeypatch.setattr(global_vars, "initial_guess", guess)
+        nls = NLSPositionCalc(OptimizationType.newton_gauss)
+        for tdoa, depth, position in zip(tdoas, depths, positions):
+            monkeypatch.setattr(global_vars, "depth_sensor_reading", lambda: depth)
+            assert np.allclose(position, nls.apply(tdoa)[:2], rtol=1e-4)
+
+
+def test_batch_takes_a_guess_per_trial(monkeypatch):
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+    phis = np.array([0.3, -2, 2.8])
+    tdoas = [[tdoa_function_3D(np.array([12, phi]), position, True)
+              for position in global_vars.hydrophone_positions[1:]] for phi in phis]
+
+    positions, converged = batch_position_calc(tdoas, PolarPosition(np.full(3, 10), phis + 0.2))
+    assert converged.all()
+    assert np.allclose(positions, np.stack((np.full(3, 12), phis), axis=-1), atol=1e-4)
+
+
+def test_stalled_problems_are_not_converged():
+    # residuals params - 1, and for the second problem a jacobian of the wrong sign, so no step
+    # reduces its cost
+    residuals = lambda params, index: params - 1
+    jacobian = lambda params, index: np.where(index == 0, 1, -1)[:, np.newaxis, np.newaxis]*np.eye(2)
+
+    params, converged = batch_newton_gauss(residuals, np.zeros((2, 2)), jacobian)
+    assert list(converged) == [True, False]
+    assert np.allclose(params, [[1, 1], [0, 0]])
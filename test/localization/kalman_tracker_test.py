@@ -0,0 +1,60 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from sim_utils.common_types import CartesianPosition, CylindricalPosition, PolarPosition, Cartesian2DPosition, cart_to_cyl
+from stages.localization.tracking.kalman_tracker import KalmanTracker
+
+
+def test_tracker_smooths_gates_outliers_and_predicts_the_guess(monkeypatch):
+    monkeypatch.setattr(global_vars, "carrier_frequency", 1)
+    monkeypatch.setattr(global_vars, "initial_guess", PolarPosition(10, np.pi))
+    rng = np.random.default_rng(0)
+    tracker = KalmanTracker(angle_sigma=0.02, range_sigma=0.1)
+
+    raw_errors = []
+    tracked_errors = []
+    for i in range(40):
+        truth = np.array([10 - 0.5*i, 5 + 0.3*i])
+        # noise along and across the line of sight, as the tracker models it
+        r = np.hypot(*truth)*(1 + rng.normal(0, 0.1))
+        phi = np.arctan2(truth[1], truth[0]) + rng.normal(0, 0.02)
+        measurement = r*np.array([np.cos(phi), np.sin(phi)])
+        if i == 30:
+            # a mirrored solution
+            measurement = -truth
+        position = tracker.apply(cart_to_cyl(CartesianPosition(*measurement, 5)))
+
+        assert type(position) == CylindricalPosition
+        assert tracker.write_frame(None)["accepted"] == (i != 30)
+        if i >= 10:
+            raw_errors.append(np.linalg.norm(measurement - truth))
+            tracked_errors.append(np.hypot(position.r*np.cos(position.phi) - truth[0],
+                                           position.r*np.sin(position.phi) - truth[1]))
+
+    assert np.median(tracked_errors) < 0.7*np.median(raw_errors)
+    # the next solve starts at the predicted position
+    guess = global_vars.initial_guess
+    assert type(guess) == PolarPosition
+    assert np.hypot(guess.r*np.cos(guess.phi) - (10 - 0.5*40), guess.r*np.sin(guess.phi) - (5 + 0.3*40)) < 1.5
+
+
+def test_tracker_predicts_over_missed_pings(monkeypatch):
+    monkeypatch.setattr(global_vars, "carrier_frequency", 1)
+    monkeypatch.setattr(global_vars, "initial_guess", Cartesian2DPosition(10, 0))
+    truth = lambda time: np.array([10 - 0.5*time, 5 + 0.3*time])
+    tracker = KalmanTracker()
+
+    for time in range(10):
+        tracker.set_ping_time(time)
+        tracker.apply(CartesianPosition(*truth(time), 5))
+
+    # the pings at 10 and 11 are missed
+    tracker.set_ping_time(12)
+    guess = global_vars.initial_guess
+    assert np.allclose([guess.x, guess.y], truth(12), atol=0.05)
+
+    position = tracker.apply(CartesianPosition(*truth(12), 5))
+    assert tracker.write_frame(None)["accepted"]
+    assert np.allclose([position.x, position.y], truth(12), atol=0.05)
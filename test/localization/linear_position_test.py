@@ -0,0 +1,36 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from sim_utils.common_types import CylindricalPosition, PolarPosition, OptimizationType
+from stages.localization.localization_utils import tdoa_function_3D
+from stages.localization.multilateration.linear import LinearPositionCalc
+from stages.localization.multilateration.initial_position_estimator import InitialPositionEstimator
+from stages.localization.multilateration.nls import NLSPositionCalc
+
+
+def test_closed_form_solution_is_exact_without_noise(monkeypatch):
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+
+    for r, phi in ((15, 0.4), (4, 2.5), (40, -2)):
+        monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(r, phi, 5))
+        tdoas = [tdoa_function_3D(np.array([r, phi]), position, True)
+                 for position in global_vars.hydrophone_positions[1:]]
+
+        position = LinearPositionCalc().apply(tdoas)
+        assert np.allclose([position.r, position.phi, position.z], [r, phi, 5])
+
+
+def test_initial_position_estimator_seeds_nls(monkeypatch):
+    monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(15, 2.5, 5))
+    monkeypatch.setattr(global_vars, "initial_guess", PolarPosition(10, 0))
+    tdoas = np.array([tdoa_function_3D(np.array([15, 2.5]), position, True)
+                      for position in global_vars.hydrophone_positions[1:]])
+    tdoas += np.random.normal(0, 0.05e-6, tdoas.shape)
+
+    assert InitialPositionEstimator().apply(tdoas) is tdoas
+    assert abs(global_vars.initial_guess.phi - 2.5) < 0.05
+
+    position = NLSPositionCalc(OptimizationType.newton_gauss, guess_at_init=False).apply(tdoas)
+    assert abs(position.phi - 2.5) < 0.05
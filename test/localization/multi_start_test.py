@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from sim_utils.common_types import CylindricalPosition, PolarPosition, Cartesian2DPosition
+from stages.localization.localization_utils import tdoa_function_3D
+from stages.localization.multilateration.multi_start import MultiStartNLSPositionCalc
+from stages.localization.multilateration.tdoa_grid_index import TDOAGridIndex
+
+
+@pytest.fixture
+def tdoas(monkeypatch):
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+    monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(20, -2.5, 5))
+    return [tdoa_function_3D(np.array([20, -2.5]), position, True)
+            for position in global_vars.hydrophone_positions[1:]]
+
+
+def test_first_good_start_skips_the_rest(monkeypatch, tdoas):
+    monkeypatch.setattr(global_vars, "initial_guess", PolarPosition(10, 0))
+
+    stage = MultiStartNLSPositionCalc(num_starts=6)
+    position = stage.apply(tdoas)
+    assert np.allclose([position.r, position.phi], [20, -2.5], atol=1e-3)
+    assert stage.write_frame(None)["num_starts"] == 1
+    assert stage.write_frame(None)["converged"]
+
+
+@pytest.mark.parametrize("seeding", ["mirrored", "random", "grid"])
+def test_all_starts_run_without_a_good_enough_one(monkeypatch, tdoas, seeding):
+    monkeypatch.setattr(global_vars, "initial_guess", Cartesian2DPosition(10, 0))
+
+    # with noise, no solution fits exactly
+    tdoas = np.array(tdoas) + np.random.normal(0, 1e-9, len(tdoas))
+    stage = MultiStartNLSPositionCalc(num_starts=6, seeding=seeding, residual_tolerance=0,
+                                      grid_index=TDOAGridIndex(cache_dir=None))
+    position = stage.apply(tdoas)
+    assert np.allclose([position.x, position.y], [20*np.cos(-2.5), 20*np.sin(-2.5)], atol=0.1)
+    assert stage.write_frame(None)["num_starts"] == 6
+
+
+def test_needs_a_start():
+    with pytest.raises(ValueError):
+        MultiStartNLSPositionCalc(num_starts=0)
@@ -0,0 +1,61 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from sim_utils.common_types import CylindricalPosition, PolarPosition, Cartesian2DPosition, OptimizationType
+from stages.localization.localization_utils import TDOAObjective, tdoa_function_3D, get_jacobian, newton_gauss, positive_range
+from stages.localization.multilateration.nls import NLSPositionCalc
+
+
+def test_analytic_jacobian_matches_numerical():
+    tdoas = np.random.normal(0, 10e-6, len(global_vars.hydrophone_positions) - 1)
+
+    for is_polar, pinger_pos in ((True, np.array([15, 0.6])), (False, np.array([-4, 9]))):
+        objective = TDOAObjective(tdoas, is_polar, depth=5)
+        jacobian = objective.jacobian(pinger_pos)
+        numerical = get_jacobian(objective.residuals, pinger_pos, (), 1e-6)
+
+        assert jacobian.shape == (len(tdoas), 2)
+        assert np.allclose(jacobian, numerical, rtol=1e-4, atol=1e-6*np.abs(jacobian).max())
+
+
+def test_newton_gauss_solves_least_squares_problems():
+    # residuals of a line fit through exact points
+    t = np.linspace(0, 1, 10)
+    line = lambda params: params[0]*t + params[1] - (3*t - 2)
+    assert np.allclose(newton_gauss(line, np.array([0, 0])), [3, -2])
+
+
+def test_nls_newton_gauss_recovers_pinger(monkeypatch):
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+
+    for phi in (0.4, 2.5, -2):
+        monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(15, phi, 5))
+        tdoas = [tdoa_function_3D(np.array([15, phi]), position, True)
+                 for position in global_vars.hydrophone_positions[1:]]
+
+        monkeypatch.setattr(global_vars, "initial_guess", PolarPosition(10, 0))
+        position = NLSPositionCalc(OptimizationType.newton_gauss).apply(tdoas)
+        assert position.r > 0
+        assert np.allclose([position.r*np.cos(position.phi), position.r*np.sin(position.phi)],
+                           [15*np.cos(phi), 15*np.sin(phi)], atol=1e-3)
+
+        monkeypatch.setattr(global_vars, "initial_guess", Cartesian2DPosition(10, 0))
+        position = NLSPositionCalc(OptimizationType.newton_gauss).apply(tdoas)
+        assert np.allclose([position.x, position.y], [15*np.cos(phi), 15*np.sin(phi)], atol=1e-3)
+
+
+def test_solutions_are_wrapped_into_one_turn(monkeypatch):
+    assert np.allclose(positive_range([[-3, 33.9], [4, -47.76], [-2, -0.5]]),
+                       [[3, 33.9 + np.pi - 12*np.pi], [4, -47.76 + 16*np.pi], [2, np.pi - 0.5]])
+
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+    monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(15, 0.4, 5))
+    tdoas = [tdoa_function_3D(np.array([15, 0.4]), position, True)
+             for position in global_vars.hydrophone_positions[1:]]
+
+    # a starting point several turns around
+    monkeypatch.setattr(global_vars, "initial_guess", PolarPosition(12, 0.5 + 6*np.pi))
+    position = NLSPositionCalc(OptimizationType.newton_gauss).apply(tdoas)
+    assert np.allclose([position.r, position.phi], [15, 0.4], atol=1e-3)
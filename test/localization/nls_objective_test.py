@@ -0,0 +1,45 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from sim_utils.common_types import CylindricalPosition, PolarPosition, Cartesian2DPosition, OptimizationType
+from stages.localization.localization_utils import TDOAObjective, tdoa_function_3D
+from stages.localization.multilateration.nls import NLSPositionCalc
+
+
+def test_objective_matches_per_hydrophone_model(monkeypatch):
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+    tdoas = np.random.normal(0, 10e-6, len(global_vars.hydrophone_positions) - 1)
+
+    for is_polar, pinger_pos in ((True, np.array([12, 0.7])), (False, np.array([-3, 8])), (True, np.array([60, 2]))):
+        expected = [tdoa_function_3D(pinger_pos, position, is_polar)
+                    for position in global_vars.hydrophone_positions[1:]]
+        objective = TDOAObjective(tdoas, is_polar)
+        r = pinger_pos[0] if is_polar else np.hypot(*pinger_pos)
+
+        assert np.allclose(objective.expected_tdoas(pinger_pos), expected, rtol=1e-9, atol=1e-15)
+        assert np.isclose(objective(pinger_pos),
+                          sum((tdoas - expected)**2 + 1e6*np.heaviside(r - 50, 0.5)))
+
+    # batches of positions give one value each
+    batch = np.array([[12, 0.7], [5, -2]])
+    assert np.allclose(objective(batch), [objective(position) for position in batch])
+
+
+def test_nls_recovers_pinger_with_a_fixed_depth(monkeypatch):
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+    monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(15, np.pi/5, 5))
+    tdoas = [tdoa_function_3D(np.array([15, np.pi/5]), position, True)
+             for position in global_vars.hydrophone_positions[1:]]
+
+    monkeypatch.setattr(global_vars, "initial_guess", PolarPosition(10, 0))
+    position = NLSPositionCalc(OptimizationType.nelder_mead).apply(tdoas)
+    assert abs(position.phi - np.pi/5) < 1e-2
+
+    monkeypatch.setattr(global_vars, "initial_guess", Cartesian2DPosition(8, 2))
+    nls = NLSPositionCalc(OptimizationType.nelder_mead)
+    # the guess is kept between pings
+    for i in range(2):
+        position = nls.apply(tdoas)
+        assert abs(np.arctan2(position.y, position.x) - np.pi/5) < 1e-2
@@ -0,0 +1,38 @@
+import os
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from sim_utils.common_types import CylindricalPosition, PolarPosition, OptimizationType
+from stages.localization.localization_utils import tdoa_function_3D
+from stages.localization.multilateration.nls import NLSPositionCalc
+from stages.localization.multilateration.tdoa_grid_index import TDOAGridIndex
+
+
+def expected_tdoas(r, phi):
+    return [tdoa_function_3D(np.array([r, phi]), position, True)
+            for position in global_vars.hydrophone_positions[1:]]
+
+
+def test_seeds_are_close_to_the_pinger(monkeypatch, tmp_path):
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+    monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(20, -2, 5))
+    index = TDOAGridIndex(cache_dir=str(tmp_path))
+
+    seed = index.seeds(expected_tdoas(20, -2), 5)
+    assert abs(seed[1] + 2) <= 2*np.pi/index.num_phi
+    assert index.seeds(np.array([expected_tdoas(20, -2)]*3), 5, k=4).shape == (3, 4, 2)
+
+    # the cached grid is loaded for the same configuration, and a new one built for another
+    assert len(os.listdir(tmp_path)) == 1
+    reloaded = TDOAGridIndex(cache_dir=str(tmp_path))
+    assert np.array_equal(reloaded.seeds(expected_tdoas(20, -2), 5.01), seed)
+    assert len(os.listdir(tmp_path)) == 1
+    reloaded.seeds(expected_tdoas(20, -2), 8)
+    assert len(os.listdir(tmp_path)) == 2
+
+    # the guess is ignored in favour of the grid
+    monkeypatch.setattr(global_vars, "initial_guess", PolarPosition(10, 1))
+    position = NLSPositionCalc(OptimizationType.newton_gauss, grid_index=index).apply(expected_tdoas(20, -2))
+    assert np.allclose([position.r, position.phi], [20, -2], atol=1e-3)
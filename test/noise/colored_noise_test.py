@@ -0,0 +1,55 @@
+import numpy as np
+from scipy import signal
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.chain import Chain
+from stages.input.input_generation_stage import InputGenerationStage
+from stages.noise.colored_noise import ColoredNoise
+
+
+def _psd_slope(noise, fs):
+    # PSD slope in dB per decade between 1 kHz and 100 kHz
+    freqs, psd = signal.welch(noise, fs, nperseg=4096, axis=-1)
+    band = (freqs >= 1e3) & (freqs <= 1e5)
+    return np.polyfit(np.log10(freqs[band]), 10 * np.log10(psd[..., band].mean(axis=0)), 1)[0]
+
+
+def test_noise_follows_the_requested_spectrum_and_level():
+    fs = 400e3
+    zeros = np.zeros((4, 200000))
+
+    # pink noise has most of its power at low frequencies, so the level of a short record varies
+    # a lot between draws
+    pink = ColoredNoise(sigma=0.1, spectrum="pink", sampling_frequency=fs)
+    pink.set_rng(np.random.default_rng(0))
+    pink = pink.apply(zeros)
+    shaped = ColoredNoise(sigma=0.1, spectrum=[(1e3, 0), (1e5, -40)], sampling_frequency=fs)
+    shaped.set_rng(np.random.default_rng(1))
+    shaped = shaped.apply(zeros)
+
+    assert np.allclose(pink.std(axis=-1), 0.1, rtol=0.1)
+    assert abs(_psd_slope(pink, fs) + 10) < 1
+    assert abs(_psd_slope(shaped, fs) + 20) < 1
+
+
+def test_noise_channels_are_correlated():
+    noise = ColoredNoise(sigma=1, spectrum="white", correlation=0.6, sampling_frequency=400e3)
+    noise.set_rng(np.random.default_rng(0))
+
+    correlation = np.corrcoef(noise.apply(np.zeros((3, 100000))))
+
+    assert np.allclose(correlation[~np.eye(3, dtype=bool)], 0.6, atol=0.02)
+
+
+def test_noise_is_shaped_at_the_rate_of_its_input():
+    chain = Chain(None)
+    chain.add_component(InputGenerationStage(0.01, 0.1, at_adc_rate=True))
+    noise = ColoredNoise(sigma=0.1, spectrum=[(1e3, 0), (1e5, -40)])
+    chain.add_component(noise)
+    noise.set_rng(np.random.default_rng(0))
+
+    fs = global_vars.sampling_frequency
+    assert noise.get_sampling_frequency() == fs
+    assert abs(_psd_slope(noise.apply(np.zeros((4, 200000))), fs) + 20) < 1
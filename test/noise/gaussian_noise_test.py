@@ -0,0 +1,28 @@
+import numpy as np
+from stages.noise.gaussian_noise import GaussianNoise
+
+
+def test_noise_is_added_in_place_only_to_owned_writeable_input():
+    noise = GaussianNoise(mu=0, sigma=1)
+    signal = np.zeros((5, 1000))
+
+    shared = noise.apply(signal)
+    assert shared is not signal and not signal.any()
+
+    noise.set_input_owned(True)
+    owned = noise.apply(signal)
+    assert owned is signal and signal.any()
+
+    signal = np.zeros((5, 1000))
+    signal.setflags(write=False)
+    assert noise.apply(signal) is not signal
+
+
+def test_noise_statistics_and_float32_output():
+    noise = GaussianNoise(mu=2, sigma=0.5, dtype=np.float32)
+
+    noisy = noise.apply(np.zeros((5, 100000), dtype=np.float32))
+
+    assert noisy.dtype == np.float32
+    assert np.allclose(noisy.mean(axis=-1), 2, atol=0.01)
+    assert np.allclose(noisy.std(axis=-1), 0.5, atol=0.01)
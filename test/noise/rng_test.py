@@ -0,0 +1,24 @@
+import numpy as np
+import global_vars
+from components.chain import Chain
+from stages.noise.gaussian_noise import GaussianNoise
+
+
+def _chain():
+    chain = Chain(np.zeros((5, 1000)))
+    chain.add_component(GaussianNoise(mu=0, sigma=1))
+    return chain
+
+
+def test_iteration_is_reproducible_on_its_own(monkeypatch):
+    monkeypatch.setattr(global_vars, "seed", 1234)
+
+    serial = _chain()
+    outputs = [serial.apply() for _ in range(3)]
+    depth = global_vars.depth_sensor_reading()
+
+    alone = _chain().apply(iteration=2)
+
+    assert np.array_equal(alone, outputs[2])
+    assert global_vars.depth_sensor_reading() == depth
+    assert not np.array_equal(outputs[0], outputs[1])
@@ -1,5 +1,8 @@
-from components.position_calc.nls_position_calc import NLSPositionCalc
-from components.position_calc import position_calc_utils
+from sim_utils import output_utils
+output_utils.configure_logger("INFO", "NLS_guess_distribution")
+
+from stages.localization.multilateration.nls import batch_position_calc
+from stages.localization import localization_utils
 import global_vars
 from simulator_main import args
 from sim_utils.common_types import *
@@ -7,6 +10,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from enum import Enum
 
+logger = output_utils.initialize_logger(__name__)
+
 # determine which parts run
 vary_noise =        False
 vary_pinger =       False
@@ -42,7 +47,7 @@ def plot_xy_distribution(x,y, initial_data, change=""):
 
     @param x                distribution of x coordinate of NLS solutions
     @param y                distribution of y coordinate of NLS solutions
-    @param initial_data     Dictionary of initialization data used to construct the NLS component
+    @param initial_data     Dictionary holding the "initial_guess" the NLS solutions started from
     @param change           a string containing information about the variable being altered by 
                             the script. Passing this allows the titles of multiple plots produced 
                             by this script to track the current value of the changing variable    
@@ -107,13 +112,11 @@ def visualize_NLS_data(pinger_guess, noise_stdev, n_iters, change_var = Changing
     @param plot_error_hist  flag to determine if to output a histogram of angular and distance error
     '''
     initial_data = {
-        "optimization_type" : OptimizationType.nelder_mead,
         "initial_guess"     : pinger_guess
     }
-    component = NLSPositionCalc(initial_data)
 
     def _true_time_of_arrival(hydrophone_position):
-        return position_calc_utils.tdoa_function_3D(
+        return localization_utils.tdoa_function_3D(
             np.array([global_vars.pinger_position.r, global_vars.pinger_position.phi]),
             hydrophone_position,
             True
@@ -124,17 +127,19 @@ def visualize_NLS_data(pinger_guess, noise_stdev, n_iters, change_var = Changing
         for hydrophone_position in global_vars.hydrophone_positions[1:]
     )
 
-    NLS_outputs = []
-    for i in range(n_iters):
-        noise = [np.random.normal(0, noise_stdev*UNIT_PREFIX['u']) for j in range(len(true_tdoa))]
-        tdoa = [tdoa_val+noise_val for tdoa_val,noise_val in zip(true_tdoa, noise)]
-        predicted_pos = component.apply(tdoa)
-        NLS_outputs.append(predicted_pos)
-
-    r_err = [(pos.r - global_vars.pinger_position.r) for pos in NLS_outputs]
-    phi_err = [(pos.phi - global_vars.pinger_position.phi) * CONV_2_DEG for pos in NLS_outputs]
-    x = [cyl_to_cart(pos).x for pos in NLS_outputs]
-    y = [cyl_to_cart(pos).y for pos in NLS_outputs]
+    # every noise realization is solved in a single batch
+    tdoa = np.array(true_tdoa) + np.random.normal(0, noise_stdev*UNIT_PREFIX['u'], (n_iters, len(true_tdoa)))
+    NLS_outputs, converged = batch_position_calc(tdoa, pinger_guess)
+    # trials that failed to converge are not part of the distribution. Trials that stopped at
+    # their minimum count as converged
+    if not converged.all():
+        logger.warning("%d of %d trials did not converge and are left out" % (np.count_nonzero(~converged), n_iters))
+    NLS_outputs = NLS_outputs[converged]
+
+    r_err = NLS_outputs[:, 0] - global_vars.pinger_position.r
+    phi_err = (NLS_outputs[:, 1] - global_vars.pinger_position.phi) * CONV_2_DEG
+    x = NLS_outputs[:, 0]*np.cos(NLS_outputs[:, 1])
+    y = NLS_outputs[:, 0]*np.sin(NLS_outputs[:, 1])
 
     if (change_var == ChangingVariable.Noise):
         change = " Noise " + r'$\sigma = $' + str(round(noise_stdev,1)) + r'$\mu s$'
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.chain import Chain
+from components.sampling.ideal_adc import IdealADC, quantize, quantized_dtype
+from stages.input.input_generation_stage import InputGenerationStage
+from stages.sampling.ideal_adc_stage import IdealADCStage
+from sim_utils.common_types import QuantizationType
+
+
+def test_quantized_output_uses_smallest_integer_type():
+    adc = IdealADC(12, QuantizationType.midtread, input_sampling_frequency=global_vars.sampling_frequency)
+    signal = np.sin(np.linspace(0, 20 * np.pi, 1000))
+
+    quantized = adc.apply(signal)
+
+    assert quantized.dtype == np.int16
+    assert quantized.min() >= -2**11 and quantized.max() <= 2**11
+    assert quantized_dtype(8) == np.int16
+    assert quantized_dtype(7) == np.int8
+
+
+def test_quantize_matches_scalar_definition():
+    signal = np.random.normal(size=500)
+    delta = (signal.max() - signal.min()) / 2**8
+
+    midrise = quantize(signal, 8, QuantizationType.midrise)
+    midtread = quantize(signal, 8, QuantizationType.midtread)
+
+    assert list(midrise) == [int((value - signal.min()) / delta) for value in signal]
+    assert list(midtread) == [int((value - signal.min()) / delta + 0.5) for value in signal]
+
+
+def test_multichannel_adc_quantizes_each_channel_over_its_own_range():
+    adc = IdealADC(12, QuantizationType.midrise)
+    signals = np.random.normal(size=(3, 5000)) * np.array([[0.1], [1], [10]])
+    out = np.empty((3, 1000), dtype=np.int16)
+
+    quantized = adc.apply(signals, out=out)
+
+    assert quantized is out
+    assert np.array_equal(quantized[1], adc.apply(signals[1]))
+    assert np.all(quantized.min(axis=-1) == -2**11)
+    assert np.all(quantized.max(axis=-1) == 2**11)
+
+
+def test_adc_stage_takes_the_rate_of_the_generated_input():
+    for at_adc_rate, sampling_frequency in ((True, global_vars.sampling_frequency),
+                                            (False, global_vars.continuous_sampling_frequency)):
+        chain = Chain(None)
+        chain.add_component(InputGenerationStage(0.01, 0.1, at_adc_rate=at_adc_rate))
+        stage = IdealADCStage(12, QuantizationType.midtread)
+        chain.add_component(stage)
+        assert stage.component.get_input_sampling_frequency() == sampling_frequency
+
+    chain = Chain(None)
+    chain.add_component(InputGenerationStage(0.01, 0.1, at_adc_rate=True))
+    with pytest.raises(ValueError):
+        chain.add_component(IdealADCStage(12, QuantizationType.midtread,
+                                          input_sampling_frequency=global_vars.continuous_sampling_frequency))
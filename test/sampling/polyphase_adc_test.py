@@ -0,0 +1,39 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+from components.sampling.polyphase_resampler import PolyphaseResampler
+from sim_utils.common_types import QuantizationType, SignalSegment
+from stages.sampling.polyphase_adc_stage import PolyphaseADCStage
+
+
+def test_resampler_passes_tones_in_band_and_rejects_aliases():
+    fs_old, fs_new = 300e3, 200e3
+    t = np.arange(30000) / fs_old
+    in_band = np.sin(2 * np.pi * 40e3 * t)
+    # would alias to 60 kHz without the anti-aliasing filter
+    out_of_band = np.sin(2 * np.pi * 140e3 * t)
+
+    resampler = PolyphaseResampler(fs_old, fs_new)
+    resampled = resampler.apply(np.stack((in_band, out_of_band)))
+
+    t_new = np.arange(resampled.shape[-1]) / fs_new
+    middle = slice(100, -100)
+    assert resampled.shape == (2, 20000)
+    assert np.allclose(resampled[0, middle], np.sin(2 * np.pi * 40e3 * t_new[middle]), atol=1e-2)
+    assert np.abs(resampled[1, middle]).max() < 1e-2
+
+
+def test_streamed_adc_matches_full_length_adc():
+    fs_old = 400e3
+    signals = np.random.normal(size=(5, 10007))
+    stage = PolyphaseADCStage(12, QuantizationType.midtread, input_sampling_frequency=fs_old,
+                              full_scale=(-5, 5))
+
+    expected = stage.apply(signals)
+    blocks = (SignalSegment(signals[:, i:i + 999], i, signals.shape[-1])
+              for i in range(0, signals.shape[-1], 999))
+    streamed = list(stage.stream(blocks, 999))
+
+    assert streamed[0].start_index == 0
+    assert np.array_equal(np.concatenate([block.data for block in streamed], axis=-1), expected)
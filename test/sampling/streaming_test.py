@@ -0,0 +1,30 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.chain import Chain
+from sim_utils.common_types import CylindricalPosition, QuantizationType
+from stages.input.input_generation_stage import InputGenerationStage
+from stages.sampling.ideal_adc_stage import IdealADCStage
+from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger
+
+global_vars.pinger_position = CylindricalPosition(10, 0.3, 10)
+
+
+def _capture(block_size, sparse=False):
+    chain = Chain(None, block_size=block_size)
+    chain.add_component(InputGenerationStage(measurement_period=0.05, duty_cycle=0.05, sparse=sparse))
+    chain.add_component(IdealADCStage(12, QuantizationType.midtread, full_scale=(-1.1, 1.1)))
+    chain.add_component(ThresholdCaptureTrigger(num_samples=200, threshold=0.05 * 2**11,
+                                                pre_trigger_samples=10))
+    return chain.apply()
+
+
+def test_streamed_capture_matches_full_length_capture():
+    expected = _capture(block_size=None)
+
+    assert expected.shape == (len(global_vars.hydrophone_positions), 210)
+    for block_size in (1000, 4099):
+        assert np.array_equal(_capture(block_size), expected)
+    assert np.array_equal(_capture(1000, sparse=True), expected)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+from components.sampling.threshold_index_finder import ThresholdIndexFinder
+from sim_utils.common_types import SignalSegment
+from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger, PingNotDetectedError
+
+
+def test_first_crossing_over_all_channels_with_per_channel_thresholds():
+    signals = np.zeros((3, 1000))
+    signals[0, 700] = 5
+    signals[1, 400] = 5
+    signals[2, 300] = 2
+
+    assert ThresholdIndexFinder(100, 1).apply(signals) == 300
+    assert ThresholdIndexFinder(100, [1, 1, 3]).apply(signals) == 400
+    assert ThresholdIndexFinder(100, [1, 1, 3], chunk_size=128).apply(signals) == 400
+    assert ThresholdIndexFinder(100, 10, chunk_size=128).apply(signals) is None
+
+
+def test_capture_is_a_view_and_missing_ping_raises():
+    signals = np.zeros((3, 1000))
+    signals[1, 400:] = 5
+    trigger = ThresholdCaptureTrigger(num_samples=100, threshold=1, pre_trigger_samples=10)
+
+    window = trigger.apply(signals)
+
+    assert window.shape == (3, 110)
+    assert np.shares_memory(window, signals)
+    with pytest.raises(PingNotDetectedError):
+        trigger.apply(np.zeros((3, 1000)))
+
+
+def test_segment_capture_matches_the_full_signal_or_raises():
+    signals = np.zeros((3, 1000))
+    signals[1, 400:450] = 5
+    trigger = ThresholdCaptureTrigger(num_samples=100, threshold=1, pre_trigger_samples=10)
+
+    window = trigger.apply(SignalSegment(signals[:, 300:600], 300, 1000))
+    assert np.array_equal(window, trigger.apply(signals))
+
+    with pytest.raises(ValueError):
+        trigger.apply(SignalSegment(signals[:, 300:450], 300, 1000))
+    with pytest.raises(ValueError):
+        trigger.apply(SignalSegment(signals[:, 395:600], 395, 1000))
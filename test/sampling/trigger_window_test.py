@@ -0,0 +1,40 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.chain import Chain
+from sim_utils.common_types import CylindricalPosition, QuantizationType, SignalSegment
+from stages.input.input_generation_stage import InputGenerationStage
+from stages.noise.gaussian_noise import GaussianNoise
+from stages.sampling.ideal_adc_stage import IdealADCStage
+from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger
+from stages.sampling.trigger_window_stage import TriggerWindowStage
+
+global_vars.pinger_position = CylindricalPosition(10, 0.3, 10)
+
+
+def _chain(trigger_first, sigma):
+    threshold = 0.05 * 2**11
+    chain = Chain(None)
+    chain.add_component(InputGenerationStage(measurement_period=0.2, duty_cycle=0.05))
+    if trigger_first:
+        chain.add_component(TriggerWindowStage(num_samples=200, threshold=threshold, num_bits=12,
+                                               noise_sigma=sigma, pre_trigger_samples=10))
+    chain.add_component(GaussianNoise(mu=0, sigma=sigma))
+    chain.add_component(IdealADCStage(12, QuantizationType.midtread))
+    chain.add_component(ThresholdCaptureTrigger(num_samples=200, threshold=threshold,
+                                                pre_trigger_samples=10))
+    return chain
+
+
+def test_trigger_first_captures_the_same_window():
+    assert np.array_equal(_chain(True, 0).apply(), _chain(False, 0).apply())
+
+    # the noise is only drawn for a short window around the ping
+    chain = _chain(True, 1e-3)
+    chain.apply()
+    window = chain.chain[1].last_output
+    assert isinstance(window, SignalSegment)
+    assert window.data.shape[-1] < window.num_samples / 50
+    assert chain.chain[1].apply(chain.chain[0].apply(None)) is window
@@ -0,0 +1,41 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.chain import Chain
+from sim_utils.common_types import CylindricalPosition, QuantizationType
+from stages.input.input_generation_stage import InputGenerationStage
+from stages.noise.gaussian_noise import GaussianNoise
+from stages.sampling.ideal_adc_stage import IdealADCStage
+from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger
+from stages.tdoa_calc.cross_correlation_stage import CrossCorrelationStage
+from stages.tdoa_calc.gcc_phat_stage import GCCPhatStage
+from stages.localization.localization_utils import reference_tdoas
+
+global_vars.pinger_position = CylindricalPosition(10, 0.3, 10)
+
+
+def test_gcc_matches_cross_correlation():
+    chain = Chain(None)
+    chain.add_component(InputGenerationStage(measurement_period=0.05, duty_cycle=0.05))
+    chain.add_component(GaussianNoise(mu=0, sigma=0.01))
+    chain.add_component(IdealADCStage(12, QuantizationType.midtread))
+    chain.add_component(ThresholdCaptureTrigger(num_samples=200, threshold=0.05 * 2**11))
+    capture = chain.apply()
+
+    assert np.allclose(GCCPhatStage().apply(capture), CrossCorrelationStage().apply(capture))
+
+
+def test_all_pairs_phat_on_broadband_signal():
+    # channel i receives the same noise burst delays[i] samples late
+    delays = np.array([0, 3, -2, 5, -4])
+    burst = np.random.normal(size=2020)
+    signals = np.stack([burst[10 - delay:2010 - delay] for delay in delays])
+
+    matrix = GCCPhatStage(pairs="all", phat=True).apply(signals)
+
+    # ti - tj at [i, j]
+    expected = (delays[:, np.newaxis] - delays) / global_vars.sampling_frequency
+    assert np.allclose(matrix, expected)
+    assert np.allclose(reference_tdoas(matrix), -delays[1:] / global_vars.sampling_frequency)
@@ -0,0 +1,44 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.chain import Chain
+from sim_utils.common_types import CylindricalPosition, QuantizationType
+from stages.input.input_generation_stage import InputGenerationStage
+from stages.noise.gaussian_noise import GaussianNoise
+from stages.sampling.ideal_adc_stage import IdealADCStage
+from stages.sampling.threshold_capture_trigger import ThresholdCaptureTrigger
+from stages.tdoa_calc.hybrid_tdoa_stage import HybridTDOAStage
+from stages.localization.localization_utils import tdoa_function_3D
+
+
+def test_hybrid_tdoa_resolves_whole_periods_at_a_low_adc_rate(monkeypatch):
+    # hydrophones far enough apart for the time differences to exceed a period
+    monkeypatch.setattr(global_vars, "hydrophone_positions", [
+        CylindricalPosition(0, 0, 0),
+        CylindricalPosition(5.5e-2, 0, 0),
+        CylindricalPosition(5.5e-2, np.pi, 0),
+        CylindricalPosition(3.6e-2, -np.pi/10, 3.6e-2),
+        CylindricalPosition(3.6e-2, -np.pi+np.pi/10, 3.6e-2),
+    ])
+    monkeypatch.setattr(global_vars, "sampling_frequency", 5 * global_vars.signal_frequency)
+    monkeypatch.setattr(global_vars, "depth_sensor_uncertainty", 0)
+
+    for phi in (0.3, 2, 4):
+        monkeypatch.setattr(global_vars, "pinger_position", CylindricalPosition(10, phi, 5))
+
+        chain = Chain(None)
+        chain.add_component(InputGenerationStage(measurement_period=0.03, duty_cycle=0.1, at_adc_rate=True))
+        chain.add_component(GaussianNoise(mu=0, sigma=0.02))
+        chain.add_component(IdealADCStage(12, QuantizationType.midtread,
+                                          input_sampling_frequency=global_vars.sampling_frequency))
+        # five cycles of the signal
+        chain.add_component(ThresholdCaptureTrigger(num_samples=25, threshold=0.3 * 2**11, pre_trigger_samples=10))
+        chain.add_component(HybridTDOAStage())
+
+        expected = [tdoa_function_3D(np.array([10, phi]), position, True)
+                    for position in global_vars.hydrophone_positions[1:]]
+        # more than half a period, out of reach of the phase alone
+        assert np.max(np.abs(expected)) > 0.5 / global_vars.signal_frequency
+        assert np.allclose(chain.apply(), expected, atol=0.5e-6)
@@ -0,0 +1,24 @@
+import numpy as np
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.tdoa_calc.phase_analysis import PhaseAnalysis, get_phases
+from stages.tdoa_calc.phase_analysis_stage import PhaseAnalysisStage
+
+
+def test_single_bin_phases_match_fft_and_pairwise_analysis():
+    n = np.arange(200)
+    period = global_vars.sampling_frequency / global_vars.signal_frequency
+    delays = np.array([0, 1.5, -2.25, 4, -0.5])
+    noise = np.random.default_rng(0).normal(0, 0.1, (5, 200))
+    signals = np.sin(2 * np.pi * (n - delays[:, np.newaxis]) / period) + noise
+
+    fft_index = int(round(len(n) / period))
+    assert np.allclose(get_phases(signals), np.angle(np.fft.fft(signals, axis=-1)[:, fft_index]))
+
+    tdoa = PhaseAnalysisStage().apply(signals)
+    pairwise = [PhaseAnalysis("test").apply((signals[0], signals[i])) for i in range(1, 5)]
+    assert np.allclose(tdoa, pairwise)
+    # t_i - t_0 within a period
+    assert np.allclose(tdoa, delays[1:] / global_vars.sampling_frequency, atol=0.1 / global_vars.sampling_frequency)
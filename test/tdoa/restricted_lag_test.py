@@ -0,0 +1,42 @@
+import numpy as np
+from scipy.signal import correlate
+from sim_utils import output_utils
+output_utils.configure_logger("WARNING", "test")
+
+import global_vars
+from components.tdoa_calc.cross_correlation import CrossCorrelation, correlate_lags
+
+
+def test_lags_match_full_correlation():
+    x = np.random.normal(size=300)
+    y = np.random.normal(size=300)
+    full = correlate(x, y, mode='full', method='direct')
+
+    for lags in (np.arange(-10, 10), np.arange(-299, 300)):
+        assert np.allclose(correlate_lags(x, y, lags), full[lags + 299])
+
+
+def test_delay_matches_full_window_search():
+    n = np.arange(400)
+    period = global_vars.sampling_frequency / global_vars.signal_frequency
+    h0 = np.round(2000 * np.sin(2 * np.pi * n / period) + np.random.normal(0, 50, n.shape))
+    h = np.round(2000 * np.sin(2 * np.pi * (n - 3.3) / period) + np.random.normal(0, 50, n.shape))
+
+    # peak of the full correlation within half a period of zero lag
+    full = correlate(h0, h, mode='same')
+    halfrange = int(np.ceil(period) / 2)
+    expected = np.argmax(full[200 - halfrange:200 + halfrange]) - halfrange
+
+    assert CrossCorrelation("test").apply((h0, h)) == expected / global_vars.sampling_frequency
+    assert CrossCorrelation("test", max_lag=8).apply((h0, h)) == -3 / global_vars.sampling_frequency
+
+
+def test_peak_interpolation_recovers_fractional_delay():
+    n = np.arange(400)
+    period = global_vars.sampling_frequency / global_vars.signal_frequency
+    h0 = np.sin(2 * np.pi * n / period)
+    h = np.sin(2 * np.pi * (n - 3.3) / period)
+
+    for interpolation in ("parabolic", "gaussian"):
+        delay = CrossCorrelation("test", interpolation=interpolation).apply((h0, h))
+        assert abs(delay * global_vars.sampling_frequency + 3.3) < 0.05